@@ -3,24 +3,24 @@ from datetime import datetime, timedelta
 from app.schemas.message import ChatMessageSchema
 from fastapi import Depends
 from app.db.session import get_db
-from supabase import create_client
-import os
-from dotenv import load_dotenv
+from app.services.supabase_client import get_supabase, save_message_to_supabase
+from postgrest import AsyncPostgrestClient
 import json
 import asyncio
 from sqlalchemy.orm import Session
 
 router = APIRouter()
 
-load_dotenv(".env")
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
-
 # 接続中のWebSocketクライアント管理
 active_connections = {}
 
 # WebSocketルーム接続
 @router.websocket("/ws/chat/{room_id}")
-async def websocket_endpoint(websocket: WebSocket, room_id: str):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    room_id: str,
+    supabase: AsyncPostgrestClient = Depends(get_supabase)
+):
     await websocket.accept()
     if room_id not in active_connections:
         active_connections[room_id] = []
@@ -35,7 +35,7 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
 
             # Supabaseに保存
             expires_at = (datetime.utcnow() + timedelta(hours=48)).isoformat()
-            supabase.table("message").insert({
+            await supabase.table("message").insert({
                 "matchid": int(room_id),
                 "senderId": sender_id,
                 "recieveId": None,  # グループチャットでは不要 or 空欄
@@ -58,16 +58,16 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
 
 # チャットルームの自動クローズ処理（24時間後）
 @router.post("/api/chat-rooms/cleanup")
-async def cleanup_expired_chat_rooms():
+async def cleanup_expired_chat_rooms(supabase: AsyncPostgrestClient = Depends(get_supabase)):
     try:
         now = datetime.utcnow().isoformat()
 
         # 削除前に件数確認（任意）
-        response = supabase.table("chat_rooms").select("*").lt("expires_at", now).execute()
+        response = await supabase.table("chat_rooms").select("*").lt("expires_at", now).execute()
         deleted_count = len(response.data)
 
         # 一括削除
-        supabase.table("chat_rooms").delete().lt("expires_at", now).execute()
+        await supabase.table("chat_rooms").delete().lt("expires_at", now).execute()
 
         return {"deleted": deleted_count}
     except Exception as e:
@@ -76,22 +76,26 @@ async def cleanup_expired_chat_rooms():
 
 # 48時間経過したメッセージ削除処理
 @router.post("/api/messages/cleanup")
-async def cleanup_old_messages():
+async def cleanup_old_messages(supabase: AsyncPostgrestClient = Depends(get_supabase)):
     try:
         now = datetime.utcnow().isoformat()
-        response = supabase.table("message").select("*").execute()
+        response = await supabase.table("message").select("*").execute()
         expired = [m for m in response.data if m.get("expires_at") and m["expires_at"] < now]
 
         for msg in expired:
-            supabase.table("message").delete().eq("id", msg["id"]).execute()
+            await supabase.table("message").delete().eq("id", msg["id"]).execute()
 
         return {"deleted": len(expired)}
     except Exception as e:
         return {"error": str(e)}
 
 @router.post("/api/chat/send")
-def send_message(payload: ChatMessageSchema, db: Session = Depends(get_db)):
-    save_message_to_supabase(payload)
+async def send_message(
+    payload: ChatMessageSchema,
+    db: Session = Depends(get_db),
+    supabase: AsyncPostgrestClient = Depends(get_supabase)
+):
+    await save_message_to_supabase(supabase, payload)
     participants = get_chat_room_participants(db, payload.chat_room_id)
     for token in participants:
         if token != payload.sender_token:
@@ -1,22 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app.db.session import get_db
-from app.db.crud import create_diary, get_diary, get_recent_diaries
-from app.schemas.diary import DiaryCreate, DiaryResponse, KeywordResponse, CleanupResponse
+from typing import Optional, Union
+from app.core.config import settings
+from app.db import crud, crud_async
+from app.db.pagination import MAX_PAGE_SIZE, InvalidCursor
+from app.db.session import get_async_db, get_db
+from app.schemas.diary import DiaryCreate, DiaryPage, DiaryResponse, EmotionTag, KeywordResponse, CleanupResponse
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# DATABASE_ASYNC が有効なら AsyncSession と非同期CRUDを使う
+get_session = get_async_db if settings.DATABASE_ASYNC else get_db
+DBSession = Union[Session, AsyncSession]
+
+async def run_crud(sync_fn, async_fn, db: DBSession, *args):
+    """セッションの種類に応じてCRUDを呼ぶ
+
+    同期セッションの場合はスレッドプールで実行し、イベントループを止めない。
+    """
+    if isinstance(db, AsyncSession):
+        return await async_fn(db, *args)
+    if asyncio.iscoroutinefunction(sync_fn):
+        return await sync_fn(db, *args)
+    return await run_in_threadpool(sync_fn, db, *args)
+
 @router.post("/diary", response_model=DiaryResponse)
 async def create_diary_endpoint(
     diary: DiaryCreate,
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """日記を投稿"""
     try:
-        db_diary = await create_diary(db, diary)
+        db_diary = await run_crud(crud.create_diary, crud_async.create_diary, db, diary)
         
         # レスポンス用に復号化
         response_diary = DiaryResponse(
@@ -40,11 +60,11 @@ async def create_diary_endpoint(
 @router.get("/diary/{diary_id}", response_model=DiaryResponse)
 async def get_diary_endpoint(
     diary_id: str,
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """特定の日記を取得"""
     try:
-        diary = get_diary(db, diary_id)
+        diary = await run_crud(crud.get_diary, crud_async.get_diary, db, diary_id)
         if not diary:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -72,11 +92,11 @@ async def get_diary_endpoint(
 @router.get("/diary/{diary_id}/keywords", response_model=KeywordResponse)
 async def get_diary_keywords_endpoint(
     diary_id: str,
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """特定の日記のキーワードを取得"""
     try:
-        diary = get_diary(db, diary_id)
+        diary = await run_crud(crud.get_diary, crud_async.get_diary, db, diary_id)
         if not diary:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -102,7 +122,7 @@ async def get_diary_keywords_endpoint(
 
 @router.delete("/diary/cleanup", response_model=CleanupResponse)
 async def cleanup_expired_diaries_endpoint(
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """期限切れの日記を削除"""
     try:
@@ -122,27 +142,40 @@ async def cleanup_expired_diaries_endpoint(
             detail="クリーンアップに失敗しました"
         )
 
-@router.get("/diaries", response_model=List[DiaryResponse])
+@router.get("/diaries", response_model=DiaryPage)
 async def get_diaries_endpoint(
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="前のページの next_cursor"),
+    emotion_tag: Optional[EmotionTag] = None,
+    db: DBSession = Depends(get_session)
 ):
-    """最近の日記一覧を取得"""
+    """期限内の日記一覧を新しい順に取得（カーソルでページング）"""
     try:
-        diaries = get_recent_diaries(db, limit)
+        diaries, next_cursor = await run_crud(
+            crud.get_diary_page, crud_async.get_diary_page, db,
+            limit, cursor, emotion_tag.value if emotion_tag else None
+        )
         
-        return [
-            DiaryResponse(
-                id=diary.id,
-                content=diary.content,
-                emotion_tag=diary.emotion_tag,
-                keywords=diary.keywords,
-                created_at=diary.created_at,
-                expires_at=diary.expires_at
-            )
-            for diary in diaries
-        ]
+        return DiaryPage(
+            items=[
+                DiaryResponse(
+                    id=diary.id,
+                    content=diary.content,
+                    emotion_tag=diary.emotion_tag,
+                    keywords=diary.keywords,
+                    created_at=diary.created_at,
+                    expires_at=diary.expires_at
+                )
+                for diary in diaries
+            ],
+            next_cursor=next_cursor
+        )
         
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="カーソルが不正です"
+        )
     except Exception as e:
         logger.error(f"Failed to get diaries: {e}")
         raise HTTPException(
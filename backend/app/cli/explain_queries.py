@@ -0,0 +1,136 @@
+"""crud の読み取りクエリを EXPLAIN し、シーケンシャルスキャンを検出する
+
+各 crud 関数を実際に呼んで発行されたSQLを記録し、同じ接続で EXPLAIN する。
+マイグレーションを適用したDB（SQLite / Postgres）に対して実行する。データは空でもよい。
+Postgres では小さなテーブルだと Seq Scan の方が安いと判断されるため、
+enable_seqscan を無効にし、インデックスで処理できないクエリだけが残るようにする。
+
+    alembic upgrade head
+    python -m app.cli.explain_queries            # シーケンシャルスキャンがあれば終了コード 1
+    python -m app.cli.explain_queries --verbose  # 全クエリの実行計画を表示
+"""
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+import argparse
+import json
+import sys
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.db import crud
+from app.db.models import Diary
+from app.db.pagination import encode_cursor
+from app.db.session import engine
+
+SAMPLE_ID = "00000000-0000-0000-0000-000000000000"
+SAMPLE_CURSOR = encode_cursor(Diary(id=SAMPLE_ID, created_at=datetime(2000, 1, 1)))
+
+# (名前, 読み取りクエリを発行する crud 関数の呼び出し)
+CHECKS: List[Tuple[str, Callable[[Session], object]]] = [
+    ("get_diary", lambda db: crud.get_diary(db, SAMPLE_ID)),
+    ("get_diary_page", lambda db: crud.get_diary_page(db, 20)),
+    ("get_diary_page (emotion_tag)", lambda db: crud.get_diary_page(db, 20, None, "happy")),
+    ("get_diary_page (cursor)", lambda db: crud.get_diary_page(db, 20, SAMPLE_CURSOR)),
+    ("get_diary_page (cursor, emotion_tag)", lambda db: crud.get_diary_page(db, 20, SAMPLE_CURSOR, "happy")),
+    ("get_keywords_since", lambda db: crud.get_keywords_since(db, datetime.utcnow())),
+    ("get_active_chat_rooms", crud.get_active_chat_rooms),
+    ("get_messages_by_match", lambda db: crud.get_messages_by_match(db, 1)),
+    ("get_notifications", lambda db: crud.get_notifications(db, "token")),
+    ("get_chat_room_participants", lambda db: crud.get_chat_room_participants(db, 1)),
+    ("get_rooms_expiring_at", lambda db: crud.get_rooms_expiring_at(db, datetime.utcnow())),
+]
+
+
+def capture_statements(connection: Connection, call: Callable[[Session], object]) -> List[Tuple[str, object]]:
+    """crud 関数が発行した SELECT 文とパラメータを記録する"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        call(Session(bind=connection))
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def explain_sqlite(connection: Connection, statement: str, parameters) -> Tuple[List[str], List[str]]:
+    """実行計画と、インデックスを使わずに走査しているテーブル"""
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    plan = [row[-1] for row in rows]
+    # "SCAN diaries" は全件走査。"SCAN ... USING INDEX" はインデックス順の走査なので除く
+    seq_scans = [
+        detail for detail in plan
+        if detail.startswith("SCAN ") and " USING " not in detail and "CONSTANT ROW" not in detail
+    ]
+    return plan, seq_scans
+
+
+def explain_postgres(connection: Connection, statement: str, parameters) -> Tuple[List[str], List[str]]:
+    result = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+    if isinstance(result, str):
+        result = json.loads(result)
+
+    plan, seq_scans = [], []
+
+    def walk(node: Dict, depth: int):
+        line = f"{'  ' * depth}{node['Node Type']}"
+        if "Relation Name" in node:
+            line += f" on {node['Relation Name']}"
+        if "Index Name" in node:
+            line += f" using {node['Index Name']}"
+        plan.append(line)
+        if node["Node Type"] == "Seq Scan":
+            seq_scans.append(line.strip())
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(result[0]["Plan"], 0)
+    return plan, seq_scans
+
+
+def run_checks(verbose: bool = False) -> int:
+    """全クエリを EXPLAIN し、シーケンシャルスキャンを含むクエリの数を返す"""
+    with engine.connect() as connection:
+        dialect = connection.dialect.name
+        if dialect == "sqlite":
+            explain = explain_sqlite
+        elif dialect == "postgresql":
+            explain = explain_postgres
+            connection.exec_driver_sql("SET enable_seqscan = off")
+        else:
+            raise SystemExit(f"Unsupported database for EXPLAIN checks: {dialect}")
+
+        flagged = 0
+        try:
+            for name, call in CHECKS:
+                for statement, parameters in capture_statements(connection, call):
+                    plan, seq_scans = explain(connection, statement, parameters)
+                    status = "SEQ SCAN" if seq_scans else "ok"
+                    print(f"[{status}] {name}")
+                    if seq_scans or verbose:
+                        for line in plan:
+                            print(f"    {line}")
+                    flagged += bool(seq_scans)
+        finally:
+            connection.rollback()
+
+    print(f"{flagged} of the checked queries use a sequential scan ({dialect})")
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the crud queries and flag sequential scans")
+    parser.add_argument("--verbose", action="store_true", help="print the plan of every query")
+    args = parser.parse_args()
+
+    sys.exit(1 if run_checks(args.verbose) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""既存の日記のキーワードと文書ベクトルを再計算する
+
+スコアリングやストップワード、spaCyモデルを変更した後に実行する。
+日記をID順のチャンクで読み込み、まとめて復号化・解析して
+diaries.keyword_ids と parsed_keywords を一括更新する。
+チャンクごとにチェックポイントを保存するため、中断しても続きから再開できる。
+
+    python -m app.cli.reindex_keywords --batch-size 500
+    python -m app.cli.reindex_keywords --restart  # チェックポイントを無視して最初から
+"""
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import json
+import logging
+import os
+import time
+
+from app.core.security import get_encryption_service
+from app.db.models import Diary
+from app.db.session import SessionLocal
+from app.services.keyword_cache import KeywordCache
+from app.services.keyword_store import pack_keywords, replace_parsed_keywords, vocabulary
+from app.services.nlp_service import ENGINES, NLPService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = ".reindex_keywords.json"
+
+
+def load_checkpoint(path: str) -> Dict:
+    """前回の進捗（最後に更新した日記IDと件数）を読み込む"""
+    if not os.path.exists(path):
+        return {"last_id": None, "processed": 0, "failed": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    """途中で落ちても壊れないよう、一時ファイルに書いてから置き換える"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def iter_chunks(db, batch_size: int, last_id: Optional[str]) -> Iterator[List[Tuple[str, str, datetime]]]:
+    """(id, 暗号化された本文, 投稿時刻) を ID のキーセット順にチャンク単位で返す"""
+    while True:
+        query = db.query(Diary.id, Diary.content, Diary.created_at)
+        if last_id is not None:
+            query = query.filter(Diary.id > last_id)
+        rows = query.order_by(Diary.id).limit(batch_size).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def decrypt_chunk(rows: List[Tuple[str, str, datetime]]) -> Tuple[List[Tuple[str, datetime]], List[str], int]:
+    """チャンクを復号化（復号できない日記は飛ばして件数を数える）"""
+    diaries, texts, failed = [], [], 0
+    for diary_id, content, created_at in rows:
+        try:
+            texts.append(get_encryption_service().decrypt_text(content))
+            diaries.append((diary_id, created_at))
+        except Exception as e:
+            logger.warning(f"Skipping diary {diary_id}: {e}")
+            failed += 1
+    return diaries, texts, failed
+
+
+def reindex(service: NLPService, batch_size: int, checkpoint_path: str, restart: bool = False) -> Dict:
+    """全日記を再解析し、チャンクごとに一括更新してチェックポイントを進める"""
+    checkpoint = {"last_id": None, "processed": 0, "failed": 0} if restart else load_checkpoint(checkpoint_path)
+    if checkpoint["last_id"] is not None:
+        logger.info(f"Resuming after diary {checkpoint['last_id']} ({checkpoint['processed']} already processed)")
+
+    started = time.perf_counter()
+    processed = 0
+    db = SessionLocal()
+    try:
+        for rows in iter_chunks(db, batch_size, checkpoint["last_id"]):
+            diaries, texts, failed = decrypt_chunk(rows)
+            results = service.analyze_batch(texts, batch_size=batch_size, return_exceptions=True)
+
+            # 解析できなかった日記は飛ばして件数を数える
+            analyzed = []
+            for diary, result in zip(diaries, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Skipping diary {diary[0]}: {result}")
+                    failed += 1
+                else:
+                    analyzed.append((diary, result))
+            diaries = [diary for diary, _ in analyzed]
+            results = [result for _, result in analyzed]
+
+            # チャンク内の語をまとめて語彙に登録してから packed 配列にする
+            vocabulary.intern(
+                word
+                for keywords, _ in results
+                for keyword in keywords
+                for word in (keyword["word"], keyword.get("original") or keyword["word"])
+            )
+            db.bulk_update_mappings(Diary, [
+                {"id": diary_id, "keyword_ids": pack_keywords(keywords), "keywords": None, "embedding": embedding}
+                for (diary_id, _), (keywords, embedding) in zip(diaries, results)
+            ])
+            replace_parsed_keywords(db, [
+                (diary_id, created_at, keywords)
+                for (diary_id, created_at), (keywords, _) in zip(diaries, results)
+            ])
+            db.commit()
+
+            processed += len(diaries)
+            checkpoint = {
+                "last_id": rows[-1][0],
+                "processed": checkpoint["processed"] + len(diaries),
+                "failed": checkpoint["failed"] + failed,
+            }
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"Reindexed {checkpoint['processed']} diaries "
+                f"({processed / elapsed:.1f} diaries/s, {checkpoint['failed']} failed)"
+            )
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        **checkpoint,
+        "elapsed_s": round(elapsed, 2),
+        "diaries_per_s": round(processed / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute keywords and embeddings for stored diaries")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--engine", choices=ENGINES, default=None)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the beginning")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    service = NLPService(engine=args.engine)
+    # 再計算が目的なので、古いスコアを返し得るキャッシュは使わない
+    service.cache = KeywordCache(service.engine, max_size=0)
+
+    summary = reindex(service, args.batch_size, args.checkpoint, args.restart)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -18,15 +18,49 @@ class Settings(BaseSettings):
     # Supabase設定
     SUPABASE_URL: Optional[str] = None
     SUPABASE_SERVICE_ROLE_KEY: Optional[str] = None
+    SUPABASE_HTTP2: bool = True
+    SUPABASE_MAX_CONNECTIONS: int = 20  # 同時接続数の上限
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS: int = 10  # 再利用のために保持する接続数
+    SUPABASE_KEEPALIVE_EXPIRY_S: float = 30.0
+    SUPABASE_TIMEOUT_S: float = 10.0  # 読み書き・接続プール待ちのタイムアウト
+    SUPABASE_CONNECT_TIMEOUT_S: float = 5.0
     
     # データベース設定（直接URL方式）
     DATABASE_URL: Optional[str] = None
+    DATABASE_ASYNC: bool = False  # APIのDBアクセスに AsyncSession（asyncpg / aiosqlite）を使う
+    DB_POOL_SIZE: int = 5  # 常に保持する接続数（SQLiteでは使わない）
+    DB_MAX_OVERFLOW: int = 10  # 一時的に追加で開ける接続数
+    DB_POOL_TIMEOUT_S: float = 30.0  # 接続の空きを待つ時間の上限
+    DB_POOL_RECYCLE_S: int = -1  # この秒数より古い接続を作り直す（-1 は無効）
+    DB_POOL_WAIT_WARN_MS: float = 100.0  # 接続の取得待ちがこれを超えたら警告
     
     # 暗号化設定
     ENCRYPTION_KEY: Optional[str] = None
     
+    # マッチング設定
+    MATCH_WORKERS: int = 2  # 感情グループを並列処理するプロセス数（uvicorn のワーカーごと）
+    INCREMENTAL_MATCH_RESYNC_S: float = 30.0  # 逐次マッチャーのプールをDBと突き合わせる間隔
+    # 一括マッチングの読み書き先。supabase（diary / parsed_keyword テーブル、参加者はユーザーID）/
+    # local（NLPジョブが書き込むテーブル、参加者は日記ID）。/api/chat-rooms の利用側が
+    # 日記IDの参加者に対応するまでは supabase のままにする
+    MATCH_SOURCE: str = "supabase"
+    
     # NLP設定
     SPACY_MODEL: str = "ja_core_news_sm"
+    NLP_ENGINE: str = "spacy"  # spacy / spacy_lite（parser無効） / sudachi（形態素解析のみ）
+    NLP_WORKERS: int = 2  # キーワード抽出を行うプロセス数（0ならプロセスプールを使わない）
+    NLP_MAX_PENDING: int = 64  # プロセスプールに同時に投入できるテキスト件数の上限（バッチは件数分）
+    NLP_BATCH_MAX_SIZE: int = 32  # まとめて解析する最大件数
+    NLP_BATCH_MAX_WAIT_MS: int = 20  # バッチが埋まるのを待つ最大時間
+    KEYWORD_CACHE_SIZE: int = 10000  # 抽出結果をメモリに保持する件数
+    KEYWORD_CACHE_PATH: Optional[str] = None  # 再起動後も使うSQLiteキャッシュのパス
+    KEYWORD_CACHE_DISK_SIZE: int = 100000  # SQLiteキャッシュの件数の上限（古く使われたものから削除）
+    NLP_JOB_CONCURRENCY: int = 8  # 同時に処理するNLPジョブの上限
+    NLP_JOB_MAX_ATTEMPTS: int = 5  # 失敗扱いにするまでの試行回数
+    NLP_JOB_POLL_INTERVAL_S: float = 1.0  # 新しいジョブを確認する間隔
+    NLP_JOB_BACKOFF_S: float = 2.0  # 再試行までの待ち時間（試行ごとに倍）
+    NLP_JOB_BACKOFF_MAX_S: float = 300.0  # 再試行までの待ち時間の上限
+    NLP_JOB_LEASE_S: float = 300.0  # 実行中のジョブの期限。延長されずに過ぎたジョブはキューに戻す
     
     class Config:
         env_file = ".env"
@@ -7,6 +7,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.config import settings
 from cryptography.fernet import Fernet
 import base64
+import threading
 
 # パスワードハッシュ化
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -68,6 +69,9 @@ class EncryptionService:
                     # キーが32バイトでない場合は新しく生成
                     key = Fernet.generate_key()
                     print(f"Warning: ENCRYPTION_KEY is not 32 bytes. Generated new key: {key.decode()}")
+                else:
+                    # Fernet はbase64エンコードされたキーを受け取る
+                    key = base64.urlsafe_b64encode(key)
             except Exception:
                 # キーの形式が不正な場合は新しく生成
                 key = Fernet.generate_key()
@@ -86,4 +90,17 @@ class EncryptionService:
         decrypted_data = self.cipher.decrypt(encrypted_data)
         return decrypted_data.decode()
 
-encryption_service = EncryptionService() 
\ No newline at end of file
+_encryption_service: Optional[EncryptionService] = None
+_encryption_service_lock = threading.Lock()
+
+def get_encryption_service() -> EncryptionService:
+    """共有の EncryptionService を返す（初回呼び出し時に作成）
+
+    キーを自動生成した場合に別々のキーで暗号化しないよう、作成はロックで1回に限る。
+    """
+    global _encryption_service
+    if _encryption_service is None:
+        with _encryption_service_lock:
+            if _encryption_service is None:
+                _encryption_service = EncryptionService()
+    return _encryption_service
\ No newline at end of file
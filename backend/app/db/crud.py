@@ -1,21 +1,23 @@
 from datetime import datetime, timedelta
-import asyncio
+from typing import Optional
 
 from sqlalchemy.orm import Session
 
-from app.core.security import encryption_service
-from app.db.models import ChatRoom, Diary, MatchTable, Message
+from app.core.security import get_encryption_service
+from app.db.models import ChatRoom, Diary, MatchTable, Message, NLPJob, Notification, ParsedKeyword
+from app.db.pagination import diary_page_query, split_page
 from app.schemas.chat_room import ChatRoomCreate
 from app.schemas.diary import DiaryCreate
 from app.schemas.match import MatchCreate
 from app.schemas.message import MessageCreate
-from app.services.nlp_service import nlp_service
+from app.services.keyword_store import keywords_for_api
+from app.services.nlp_jobs import nlp_job_worker
 
 
 async def create_diary(db: Session, diary: DiaryCreate) -> Diary:
     """日記を作成（暗号化して保存）"""
     # 内容を暗号化
-    encrypted_content = encryption_service.encrypt_text(diary.content)
+    encrypted_content = get_encryption_service().encrypt_text(diary.content)
     
     # 日記オブジェクトを作成
     db_diary = Diary(
@@ -23,81 +25,51 @@ async def create_diary(db: Session, diary: DiaryCreate) -> Diary:
         emotion_tag=diary.emotion_tag.value if diary.emotion_tag else None
     )
     
-    # データベースに保存
+    # 日記とNLPジョブを同じトランザクションで保存
     db.add(db_diary)
+    db.flush()
+    db.add(NLPJob(diary_id=db_diary.id))
     db.commit()
     db.refresh(db_diary)
     
-    # 非同期でNLP処理を実行
-    asyncio.create_task(process_nlp_async(db, db_diary.id, diary.content))
+    # NLP処理はジョブワーカーが行う
+    nlp_job_worker.notify()
     
     return db_diary
 
-async def process_nlp_async(db: Session, diary_id: str, original_content: str):
-    """非同期でNLP処理を実行"""
-    try:
-        # キーワード抽出
-        keywords = await nlp_service.extract_keywords_async(original_content)
-        
-        # データベースを更新
-        db_diary = db.query(Diary).filter(Diary.id == diary_id).first()
-        if db_diary:
-            db_diary.keywords = keywords
-            db.commit()
-            
-    except Exception as e:
-        print(f"NLP processing error: {e}")
-
 def get_diary(db: Session, diary_id: str) -> Diary:
     """日記を取得（復号化して返す）"""
     diary = db.query(Diary).filter(Diary.id == diary_id).first()
     if diary:
         # 内容を復号化
-        diary.content = encryption_service.decrypt_text(diary.content)
+        diary.content = get_encryption_service().decrypt_text(diary.content)
+        if diary.keyword_ids:
+            diary.keywords = keywords_for_api(diary.keyword_ids)
     return diary
 
-def get_recent_diaries(db: Session, limit: int = 100) -> list[Diary]:
-    """最近の日記を取得"""
-    diaries = db.query(Diary).order_by(Diary.created_at.desc()).limit(limit).all()
+def get_diary_page(
+    db: Session,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    emotion_tag: Optional[str] = None
+) -> tuple[list[Diary], Optional[str]]:
+    """期限内の日記を新しい順に1ページ取得（日記と次のページのカーソルを返す）"""
+    rows = db.execute(diary_page_query(limit, cursor, emotion_tag)).scalars().all()
+    diaries, next_cursor = split_page(list(rows), limit)
     
-    # 内容を復号化
+    # 内容を復号化（カーソルは復号前に作成済み）
     for diary in diaries:
-        diary.content = encryption_service.decrypt_text(diary.content)
+        diary.content = get_encryption_service().decrypt_text(diary.content)
+        if diary.keyword_ids:
+            diary.keywords = keywords_for_api(diary.keyword_ids)
     
-    return diaries 
-async def create_diary(db: Session, diary: DiaryCreate) -> Diary:
-    encrypted_content = encryption_service.encrypt_text(diary.content)
-    db_diary = Diary(
-        content=encrypted_content,
-        emotion_tag=diary.emotion_tag.value if diary.emotion_tag else None
-    )
-    db.add(db_diary)
-    db.commit()
-    db.refresh(db_diary)
-    asyncio.create_task(process_nlp_async(db, db_diary.id, diary.content))
-    return db_diary
-
-async def process_nlp_async(db: Session, diary_id: str, original_content: str):
-    try:
-        keywords = await nlp_service.extract_keywords_async(original_content)
-        db_diary = db.query(Diary).filter(Diary.id == diary_id).first()
-        if db_diary:
-            db_diary.keywords = keywords
-            db.commit()
-    except Exception as e:
-        print(f"NLP processing error: {e}")
-
-def get_diary(db: Session, diary_id: str) -> Diary:
-    diary = db.query(Diary).filter(Diary.id == diary_id).first()
-    if diary:
-        diary.content = encryption_service.decrypt_text(diary.content)
-    return diary
+    return diaries, next_cursor
 
-def get_recent_diaries(db: Session, limit: int = 100) -> list[Diary]:
-    diaries = db.query(Diary).order_by(Diary.created_at.desc()).limit(limit).all()
-    for diary in diaries:
-        diary.content = encryption_service.decrypt_text(diary.content)
-    return diaries
+def get_keywords_since(db: Session, since: datetime) -> list[str]:
+    """since 以降に投稿された日記のキーワード（重複なし）"""
+    # DISTINCT にすると word 順の全件走査が選ばれやすいため、範囲検索の結果をここで重複除去する
+    rows = db.query(ParsedKeyword.word).filter(ParsedKeyword.created_at >= since).all()
+    return list(dict.fromkeys(word for word, in rows))
 
 # -------------------------
 # 💬 Chat 関連
@@ -150,30 +122,30 @@ def get_messages_by_match(db: Session, match_id: str) -> list[Message]:
     return db.query(Message).filter(Message.match_id == match_id).order_by(Message.send_at.asc()).all()
 
 def create_notification(db: Session, user_token: str, message: str):
-    notif = models.Notification(user_token=user_token, message=message)
+    notif = Notification(anonymous_token=user_token, message=message)
     db.add(notif)
     db.commit()
     db.refresh(notif)
     return notif
 
 def get_notifications(db: Session, user_token: str):
-    return db.query(models.Notification).filter(models.Notification.user_token == user_token).all()
+    return db.query(Notification).filter(Notification.anonymous_token == user_token).all()
 
 def get_chat_room_participants(db: Session, room_id: int) -> list[str]:
-    room = db.query(models.ChatRoom).filter(models.ChatRoom.id == room_id).first()
+    room = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
     if room and room.participants:
         return room.participants  # JSONBとしてリスト扱いされる
     return []
 
 def get_chat_room_participants(db: Session, room_id: int) -> list[str]:
-    room = db.query(models.ChatRoom).filter(models.ChatRoom.id == room_id).first()
+    room = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
     if room and room.participants:
         return room.participants  # JSONB型でlistのはず
     return []
 
 def get_rooms_expiring_at(db: Session, expires_at_time: datetime):
     return (
-        db.query(models.ChatRoom)
-        .filter(models.ChatRoom.expires_at.between(expires_at_time - timedelta(minutes=1), expires_at_time + timedelta(minutes=1)))
+        db.query(ChatRoom)
+        .filter(ChatRoom.expires_at.between(expires_at_time - timedelta(minutes=1), expires_at_time + timedelta(minutes=1)))
         .all()
     )
\ No newline at end of file
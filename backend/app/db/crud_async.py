@@ -0,0 +1,103 @@
+from datetime import datetime
+from typing import Optional
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import get_encryption_service
+from app.db.models import ChatRoom, Diary, Message, NLPJob
+from app.db.pagination import diary_page_query, split_page
+from app.schemas.chat_room import ChatRoomCreate
+from app.schemas.diary import DiaryCreate
+from app.services.keyword_store import keywords_for_api
+from app.services.nlp_jobs import nlp_job_worker
+
+# crud.py の非同期版（DATABASE_ASYNC が有効な場合に AsyncSession で使う）
+
+
+async def _decode_keywords(diaries: list[Diary]):
+    """packed 配列のキーワードをAPIの形に戻す（語彙の参照はスレッドで行う）"""
+    packed = [diary for diary in diaries if diary.keyword_ids]
+    if not packed:
+        return
+    keywords = await asyncio.to_thread(lambda: [keywords_for_api(diary.keyword_ids) for diary in packed])
+    for diary, diary_keywords in zip(packed, keywords):
+        diary.keywords = diary_keywords
+
+async def create_diary(db: AsyncSession, diary: DiaryCreate) -> Diary:
+    """日記を作成（暗号化して保存）"""
+    # 内容を暗号化
+    encrypted_content = get_encryption_service().encrypt_text(diary.content)
+    
+    # 日記オブジェクトを作成
+    db_diary = Diary(
+        content=encrypted_content,
+        emotion_tag=diary.emotion_tag.value if diary.emotion_tag else None
+    )
+    
+    # 日記とNLPジョブを同じトランザクションで保存
+    db.add(db_diary)
+    await db.flush()
+    db.add(NLPJob(diary_id=db_diary.id))
+    await db.commit()
+    await db.refresh(db_diary)
+    
+    # NLP処理はジョブワーカーが行う
+    nlp_job_worker.notify()
+    
+    return db_diary
+
+async def get_diary(db: AsyncSession, diary_id: str) -> Diary:
+    """日記を取得（復号化して返す）"""
+    diary = await db.get(Diary, diary_id)
+    if diary:
+        # 内容を復号化
+        diary.content = get_encryption_service().decrypt_text(diary.content)
+        await _decode_keywords([diary])
+    return diary
+
+async def get_diary_page(
+    db: AsyncSession,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    emotion_tag: Optional[str] = None
+) -> tuple[list[Diary], Optional[str]]:
+    """期限内の日記を新しい順に1ページ取得（日記と次のページのカーソルを返す）"""
+    result = await db.execute(diary_page_query(limit, cursor, emotion_tag))
+    diaries, next_cursor = split_page(list(result.scalars().all()), limit)
+    
+    # 内容の復号化はスレッドで行い、イベントループを止めない
+    def decrypt():
+        for diary in diaries:
+            diary.content = get_encryption_service().decrypt_text(diary.content)
+    await asyncio.to_thread(decrypt)
+    await _decode_keywords(diaries)
+    
+    return diaries, next_cursor
+
+# -------------------------
+# 💬 Chat 関連
+# -------------------------
+
+async def create_chat_room(db: AsyncSession, room: ChatRoomCreate) -> ChatRoom:
+    db_room = ChatRoom(
+        participants=room.participants,
+        empathy_words=room.empathy_words,
+        expires_at=room.expires_at
+    )
+    db.add(db_room)
+    await db.commit()
+    await db.refresh(db_room)
+    return db_room
+
+async def get_active_chat_rooms(db: AsyncSession) -> list[ChatRoom]:
+    now = datetime.utcnow()
+    result = await db.execute(select(ChatRoom).where(ChatRoom.expires_at > now))
+    return list(result.scalars().all())
+
+async def get_messages_by_match(db: AsyncSession, match_id: str) -> list[Message]:
+    result = await db.execute(
+        select(Message).where(Message.match_id == match_id).order_by(Message.send_at.asc())
+    )
+    return list(result.scalars().all())
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Text, DateTime, JSON, Integer, ForeignKey
+from sqlalchemy import Column, String, Text, DateTime, JSON, Integer, ForeignKey, Boolean, LargeBinary, Index, false, text
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime, timedelta
 import uuid
@@ -10,20 +11,65 @@ def generate_uuid():
 
 class Diary(Base):
     __tablename__ = "diaries"
+    __table_args__ = (
+        # 一覧のキーセットページング（新しい順）と感情タグでの絞り込み用
+        Index("ix_diaries_created_at_id", "created_at", "id"),
+        Index("ix_diaries_emotion_tag_created_at_id", "emotion_tag", "created_at", "id"),
+        # 期限切れの日記の削除用
+        Index("ix_diaries_expires_at", "expires_at"),
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     content = Column(Text, nullable=False)  # 暗号化された内容
     emotion_tag = Column(String, nullable=True)
-    keywords = Column(JSON, nullable=True)  # 抽出されたキーワード
+    keywords = Column(JSON, nullable=True)  # 抽出されたキーワード（旧形式。新しい日記は keyword_ids に保存）
+    embedding = Column(LargeBinary, nullable=True)  # 文書ベクトル（正規化済みfloat32）
+    keyword_ids = Column(LargeBinary, nullable=True)  # (語彙ID, 重要度, 表層形, 品詞, 頻度) の packed 配列（keyword_store の形式）
+    matched = Column(Boolean, nullable=False, default=False, server_default=false())  # チャットルームに入ったか
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime, default=lambda: datetime.utcnow() + timedelta(hours=24)) 
 
+class Vocabulary(Base):
+    __tablename__ = "vocabulary"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    word = Column(String, nullable=False, unique=True)  # キーワードの原形（packed 配列の表層形も含む）
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class NLPJob(Base):
+    __tablename__ = "nlp_jobs"
+    __table_args__ = (
+        Index("ix_nlp_jobs_status_next_run_at", "status", "next_run_at"),
+        # ジョブの取り出し用。完了したジョブは含めないため、テーブルが大きくなっても小さいまま
+        Index(
+            "ix_nlp_jobs_pending_next_run_at", "next_run_at", "id",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'")
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    diary_id = Column(String, ForeignKey("diaries.id"), nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending / running / done / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    locked_until = Column(DateTime, nullable=True)  # 実行中のジョブの期限（処理中のプロセスが延長する）
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class ParsedKeyword(Base):
     __tablename__ = "parsed_keywords"
+    __table_args__ = (
+        Index("ix_parsed_keywords_word_created_at", "word", "created_at"),
+        Index("ix_parsed_keywords_diary_id", "diary_id"),
+        # 期間内のキーワード一覧用（word まで含め、テーブルを読まずに済ませる）
+        Index("ix_parsed_keywords_created_at_word", "created_at", "word"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     diary_id = Column(String, ForeignKey("diaries.id"), nullable=False)
-    user_id = Column(String, nullable=False)  # SupabaseユーザーID
+    user_id = Column(String, nullable=True)  # SupabaseユーザーID（匿名の日記では空）
     word = Column(String, nullable=False)
     frequency = Column(Integer, default=1)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -38,6 +84,9 @@ class MatchTable(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_match_id_send_at", "match_id", "send_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     match_id = Column(Integer, ForeignKey("match_table.id"), nullable=False)
@@ -49,6 +98,9 @@ class Message(Base):
 
 class ChatRoom(Base):
     __tablename__ = "chat_rooms"
+    __table_args__ = (
+        Index("ix_chat_rooms_expires_at", "expires_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     participants = Column(JSON, nullable=False)  # 例: ["user1", "user2", ...]
@@ -57,6 +109,9 @@ class ChatRoom(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_anonymous_token_created_at", "anonymous_token", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     type = Column(String)
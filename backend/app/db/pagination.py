@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Optional, Tuple
+import base64
+import json
+
+from sqlalchemy import Select, select, tuple_
+
+from app.db.models import Diary
+
+# 1ページの件数の上限
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """クライアントから渡されたカーソルを解釈できない"""
+
+
+def encode_cursor(diary: Diary) -> str:
+    """ページ末尾の日記の (投稿時刻, ID) を不透明なカーソル文字列にする"""
+    payload = json.dumps([diary.created_at.isoformat(), diary.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, diary_id = json.loads(payload)
+        return datetime.fromisoformat(created_at), str(diary_id)
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def diary_page_query(
+    limit: int,
+    cursor: Optional[str] = None,
+    emotion_tag: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> Select:
+    """期限内の日記を新しい順に limit + 1 件取得するクエリ（キーセット方式）
+
+    (created_at, id) の複合インデックスを降順にたどり、カーソルの位置から
+    読み始めるため、何ページ目でも先頭ページと同じコストで取得できる。
+    1件多く読むのは次のページがあるかを判定するため。
+    """
+    query = select(Diary).where(Diary.expires_at > (now or datetime.utcnow()))
+    if emotion_tag is not None:
+        query = query.where(Diary.emotion_tag == emotion_tag)
+    if cursor is not None:
+        query = query.where(tuple_(Diary.created_at, Diary.id) < tuple_(*decode_cursor(cursor)))
+    return query.order_by(Diary.created_at.desc(), Diary.id.desc()).limit(limit + 1)
+
+
+def split_page(diaries: list[Diary], limit: int) -> Tuple[list[Diary], Optional[str]]:
+    """limit + 1 件の結果をページと次のカーソルに分ける"""
+    if len(diaries) <= limit:
+        return diaries, None
+    diaries = diaries[:limit]
+    return diaries, encode_cursor(diaries[-1])
@@ -0,0 +1,165 @@
+from typing import Dict, Optional
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# 接続の取得待ち時間のヒストグラムの境界（ミリ秒）
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+# 取得待ちの警告を出す最短間隔（飽和している間に毎回出さない）
+WARN_INTERVAL_S = 10.0
+
+
+class _TimedPoolMixin:
+    """接続の取得（_do_get）にかかった時間を PoolMetrics に記録する
+
+    プールに空きがなければ、ここで他の処理が接続を返すのを待つ。
+    新しい接続を作る場合はその接続時間も含む。
+    """
+
+    _metrics: Optional["PoolMetrics"] = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            if self._metrics is not None:
+                self._metrics.record_wait(time.perf_counter() - started, timed_out)
+
+    def recreate(self):
+        # dispose() で作り直されたプールにも記録先を引き継ぐ
+        pool = super().recreate()
+        pool._metrics = self._metrics
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class PoolMetrics:
+    """コネクションプールの利用状況
+
+    貸し出し中の接続数とオーバーフローはプールから、接続の年齢は
+    プールイベント（connect / close）から、取得待ち時間は Timed*Pool から集める。
+    """
+
+    def __init__(self, name: str, warn_ms: float):
+        self.name = name
+        self.warn_ms = warn_ms
+        self.engine = None
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_count = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+        self.slow_waits = 0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+        self._connected_at: Dict[int, float] = {}
+        self._last_warning = 0.0
+        self._lock = threading.Lock()
+
+    def attach(self, engine) -> "PoolMetrics":
+        """エンジンのプールにイベントを登録（非同期エンジンは sync_engine を渡す）"""
+        self.engine = engine
+        if isinstance(engine.pool, _TimedPoolMixin):
+            engine.pool._metrics = self
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "close", self._on_close)
+        event.listen(engine, "detach", self._on_close)
+        return self
+
+    def record_wait(self, elapsed: float, timed_out: bool = False):
+        elapsed_ms = elapsed * 1000
+        bucket = next((i for i, bound in enumerate(WAIT_BUCKETS_MS) if elapsed_ms <= bound), len(WAIT_BUCKETS_MS))
+        with self._lock:
+            self.wait_buckets[bucket] += 1
+            self.wait_count += 1
+            self.wait_total_s += elapsed
+            self.wait_max_s = max(self.wait_max_s, elapsed)
+            if timed_out:
+                self.timeouts += 1
+            if elapsed_ms < self.warn_ms:
+                return
+            self.slow_waits += 1
+            now = time.monotonic()
+            if now - self._last_warning < WARN_INTERVAL_S:
+                return
+            self._last_warning = now
+
+        pool = self.engine.pool if self.engine is not None else None
+        logger.warning(
+            f"DB pool '{self.name}' checkout waited {elapsed_ms:.0f}ms "
+            f"({pool.status() if pool is not None else 'no pool'}); "
+            f"consider raising DB_POOL_SIZE / DB_MAX_OVERFLOW or reducing concurrent DB work"
+        )
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._connected_at[id(connection_record)] = time.time()
+
+    def _on_close(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._connected_at.pop(id(connection_record), None)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        pool = self.engine.pool
+        if isinstance(pool, QueuePool):
+            with self._lock:
+                self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+                self.peak_overflow = max(self.peak_overflow, pool.overflow())
+
+    def snapshot(self) -> Dict:
+        """メトリクスの現在値（/metrics/db-pool で返す）"""
+        pool = self.engine.pool
+        now = time.time()
+        with self._lock:
+            ages = [now - connected_at for connected_at in self._connected_at.values()]
+            snapshot = {
+                "pool_class": type(pool).__name__,
+                "connections": len(ages),
+                "connection_age_s": {
+                    "max": round(max(ages), 1) if ages else 0.0,
+                    "mean": round(sum(ages) / len(ages), 1) if ages else 0.0,
+                },
+                "checkout_wait": {
+                    "count": self.wait_count,
+                    "mean_ms": round(self.wait_total_s * 1000 / self.wait_count, 3) if self.wait_count else 0.0,
+                    "max_ms": round(self.wait_max_s * 1000, 3),
+                    "slow": self.slow_waits,
+                    "timeouts": self.timeouts,
+                    "histogram_ms": {
+                        **{f"le_{bound}": count for bound, count in zip(WAIT_BUCKETS_MS, self.wait_buckets)},
+                        "inf": self.wait_buckets[-1],
+                    },
+                },
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": self.peak_overflow,
+            }
+
+        if isinstance(pool, QueuePool):
+            snapshot.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                # 負の値は pool_size まで接続が作られていないことを表す
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+            })
+        return snapshot
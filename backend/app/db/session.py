@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 from app.core.config import settings
+from app.db.pool import PoolMetrics, TimedAsyncAdaptedQueuePool, TimedQueuePool
 import os
 import logging
 
@@ -45,20 +47,61 @@ DATABASE_URL = get_database_url()
 
 connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
 
+def get_pool_options(poolclass) -> dict:
+    """プールの設定（SQLiteはプールの大きさを SQLAlchemy の既定のままにする）"""
+    if "sqlite" in DATABASE_URL:
+        # インメモリDBは接続ごとに別のDBになるため、SQLAlchemy の既定のプールを使う
+        in_memory = make_url(DATABASE_URL).database in (None, "", ":memory:")
+        return {} if in_memory else {"poolclass": poolclass}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_S,
+        "pool_recycle": settings.DB_POOL_RECYCLE_S,
+    }
+
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
     echo=settings.DEBUG,
-    pool_size=5 if "sqlite" not in DATABASE_URL else None,
-    max_overflow=10 if "sqlite" not in DATABASE_URL else None,
-    connect_args=connect_args
+    connect_args=connect_args,
+    **get_pool_options(TimedQueuePool)
 )
 
+# プールの利用状況（/metrics/db-pool で返す）
+pool_metrics = {"sync": PoolMetrics("sync", settings.DB_POOL_WAIT_WARN_MS).attach(engine)}
+
 # --- セッション・ベース定義 ---
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# --- 非同期エンジン（DATABASE_ASYNC が有効な場合のみ作成） ---
+
+def get_async_database_url(url: str) -> str:
+    """同期用のURLを非同期ドライバ（asyncpg / aiosqlite）のURLに変換"""
+    scheme, rest = url.split("://", 1)
+    if scheme.startswith("postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+async_engine = None
+AsyncSessionLocal = None
+
+if settings.DATABASE_ASYNC:
+    async_engine = create_async_engine(
+        get_async_database_url(DATABASE_URL),
+        pool_pre_ping=True,
+        echo=settings.DEBUG,
+        **get_pool_options(TimedAsyncAdaptedQueuePool)
+    )
+    pool_metrics["async"] = PoolMetrics("async", settings.DB_POOL_WAIT_WARN_MS).attach(async_engine.sync_engine)
+    # commit 後も属性を読めるよう expire しない（非同期では遅延ロードできないため）
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # --- DB セッション取得用の依存関数 ---
 
 def get_db():
@@ -69,6 +112,22 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """非同期データベースセッションの取得（DATABASE_ASYNC が有効な場合）"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("DATABASE_ASYNC is disabled; use get_db")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_pool_metrics() -> dict:
+    """エンジンごとのプールのメトリクス"""
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
+
+async def dispose_async_engine():
+    """非同期エンジンの接続を閉じる"""
+    if async_engine is not None:
+        await async_engine.dispose()
+
 # --- 接続テスト ---
 
 def test_database_connection():
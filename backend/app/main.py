@@ -1,8 +1,15 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
+import asyncio
 import socketio
 import logging
+import time
+
+# モジュールの読み込みにかかった時間も起動時間の内訳として記録する
+_import_started = time.perf_counter()
 
 # 1. .env を一番最初に読み込む（Supabase 初期化前に必要）
 load_dotenv()
@@ -15,14 +22,85 @@ logger = logging.getLogger(__name__)
 from app.core.config import settings
 from app.core.socket import sio
 
-# 4. FastAPI アプリ本体の作成
+# 4. 起動・停止処理（モデル・クライアントの初期化とバックグラウンド処理）
+from app.core.security import get_encryption_service
+from app.db.session import dispose_async_engine, get_pool_metrics
+from app.services.incremental_matcher import incremental_matcher
+from app.services.match import create_room_for_diaries, load_unmatched_diaries, notify_room_created
+from app.services.match_sweep import shutdown_executor
+from app.services.nlp_batcher import keyword_batcher
+from app.services.nlp_jobs import nlp_job_worker
+from app.services.nlp_pool import nlp_pool
+from app.services.nlp_service import get_nlp_service
+from app.services.supabase_client import close_supabase, get_supabase
+
+# /ready で返す起動状態（各ステップの所要秒数と失敗したステップ）
+startup_state = {"ready": False, "timings": {}, "errors": {}}
+
+async def _timed_step(name: str, step):
+    started = time.perf_counter()
+    try:
+        await step()
+    except Exception as e:
+        startup_state["errors"][name] = str(e)
+        logger.error(f"Startup step '{name}' failed: {e}")
+    finally:
+        startup_state["timings"][name] = round(time.perf_counter() - started, 3)
+
+def _load_nlp_model():
+    get_nlp_service().warm_up()
+
+async def warm_up():
+    """共有クライアントとモデルを初期化し、推論を1回済ませてから ready にする"""
+    started = time.perf_counter()
+    steps = [_timed_step("encryption", lambda: asyncio.to_thread(get_encryption_service))]
+    if settings.SUPABASE_URL:
+        steps.append(_timed_step("supabase", lambda: asyncio.to_thread(get_supabase)))
+    if nlp_pool.workers > 0:
+        # モデルは各ワーカーが読み込む（メインプロセスには読み込まない）
+        steps.append(_timed_step("nlp_pool", nlp_pool.start))
+    else:
+        steps.append(_timed_step("nlp_model", lambda: asyncio.to_thread(_load_nlp_model)))
+    await asyncio.gather(*steps)
+
+    # NLPの準備ができてからジョブの処理を始める
+    await _timed_step("incremental_matcher", lambda: incremental_matcher.start(
+        create_room_for_diaries, load_unmatched_diaries, notify_room_created
+    ))
+    await _timed_step("nlp_jobs", nlp_job_worker.start)
+
+    startup_state["timings"]["total"] = round(time.perf_counter() - started, 3)
+    startup_state["ready"] = not startup_state["errors"]
+    logger.info(f"Startup finished: ready={startup_state['ready']} timings={startup_state['timings']}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 初期化はバックグラウンドで行い、その間も /health には応答する
+    warm_up_task = asyncio.create_task(warm_up())
+    yield
+    if not warm_up_task.done():
+        warm_up_task.cancel()
+        try:
+            await warm_up_task
+        except asyncio.CancelledError:
+            pass
+    await nlp_job_worker.stop()
+    await incremental_matcher.stop()
+    await keyword_batcher.drain()
+    await nlp_pool.stop()
+    shutdown_executor()
+    await close_supabase()
+    await dispose_async_engine()
+
+# 5. FastAPI アプリ本体の作成
 app = FastAPI(
     title=settings.APP_NAME,
     description="匿名日記サービス API",
-    version=settings.VERSION
+    version=settings.VERSION,
+    lifespan=lifespan
 )
 
-# 5. CORS設定
+# 6. CORS設定
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_ORIGINS,
@@ -31,14 +109,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 6. APIルーター登録（.env読み込み後にモジュール読み込み）
+# 7. APIルーター登録（.env読み込み後にモジュール読み込み）
 from app.api import diary, chat, match
 
 app.include_router(diary.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
 app.include_router(match.router, prefix="/api")
 
-# 7. テスト用エンドポイント
+startup_state["timings"]["imports"] = round(time.perf_counter() - _import_started, 3)
+
+# 8. テスト用エンドポイント
 @app.get("/")
 async def root():
     return {
@@ -49,7 +129,29 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    """プロセスの生存確認（モデルの読み込み中でも応答する）"""
     return {"status": "healthy"}
 
-# 8. Socket.IO アプリとして FastAPI を統合
+@app.get("/ready")
+async def readiness_check():
+    """モデルとクライアントの初期化が終わり、トラフィックを受けられるか"""
+    if startup_state["errors"]:
+        status = "failed"
+    else:
+        status = "ready" if startup_state["ready"] else "starting"
+    return JSONResponse(
+        status_code=200 if startup_state["ready"] else 503,
+        content={"status": status, "timings": startup_state["timings"], "errors": startup_state["errors"]}
+    )
+
+@app.get("/metrics/nlp-jobs")
+async def nlp_job_metrics():
+    return await nlp_job_worker.metrics()
+
+@app.get("/metrics/db-pool")
+async def db_pool_metrics():
+    """DBコネクションプールの貸し出し数・取得待ち時間・接続の年齢"""
+    return get_pool_metrics()
+
+# 9. Socket.IO アプリとして FastAPI を統合
 socket_app = socketio.ASGIApp(sio, app)
@@ -34,6 +34,10 @@ class DiaryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class DiaryPage(BaseModel):
+    items: List[DiaryResponse]
+    next_cursor: Optional[str] = Field(None, description="次のページのカーソル（最後のページでは null）")
+
 class KeywordResponse(BaseModel):
     diary_id: str
     keywords: List[str] = Field(..., description="抽出されたキーワード")
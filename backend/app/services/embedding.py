@@ -0,0 +1,81 @@
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import base64
+
+# NumPy は埋め込みバックエンドを使う場合のみ必要（spaCy の依存として通常は入っている）
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 一度に内積を計算する行数（中間行列のメモリを抑える）
+BLOCK_SIZE = 1024
+
+
+def is_available() -> bool:
+    """NumPy が使えるか"""
+    return np is not None
+
+
+def encode_vector(vector) -> Optional[bytes]:
+    """ベクトルをL2正規化し、float32のバイト列に変換"""
+    array = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(array))
+    if array.size == 0 or norm == 0.0:
+        return None
+    return (array / norm).astype(np.float32).tobytes()
+
+
+def decode_vector(value: Union[bytes, str, None]):
+    """保存されたベクトルを float32 の配列に戻す
+
+    bytea はPostgRESTから "\\x..." の16進文字列で返るため、その形式と
+    base64文字列、生のバイト列を受け付ける。
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:]) if value.startswith("\\x") else base64.b64decode(value)
+    if not value:
+        return None
+    return np.frombuffer(value, dtype=np.float32)
+
+
+def similar_edges(
+    vectors: Sequence,
+    threshold: float,
+    block_size: int = BLOCK_SIZE,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[Tuple[float, int, int]]:
+    """コサイン類似度が閾値以上のペアを (類似度, i, j) の辺リストとして返す（i < j）
+
+    正規化済みベクトルの内積を行ブロックごとに総当たりで計算する（CPUのみ）。
+    ベクトルがない日記は対象外。stats を渡すと比較したペア数を加算する。
+    """
+    if not is_available():
+        raise RuntimeError("numpy is required for the embedding similarity backend")
+
+    positions = [i for i, vector in enumerate(vectors) if vector is not None]
+    edges: List[Tuple[float, int, int]] = []
+    if len(positions) < 2:
+        return edges
+
+    matrix = np.vstack([vectors[i] for i in positions]).astype(np.float32, copy=False)
+    positions = np.asarray(positions, dtype=np.int64)
+    n = len(positions)
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        similarities = matrix[start:stop] @ matrix.T
+
+        rows, cols = np.nonzero(similarities >= threshold)
+        rows = rows + start
+        later = cols > rows
+        rows, cols = rows[later], cols[later]
+        if stats is not None:
+            # 比較したのは後続の全ペア
+            stats["pairs_scored"] = stats.get("pairs_scored", 0) + sum(n - 1 - i for i in range(start, stop))
+
+        values = similarities[rows - start, cols].astype(np.float64)
+        edges.extend(zip(values.tolist(), positions[rows].tolist(), positions[cols].tolist()))
+
+    return edges
@@ -0,0 +1,257 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.services.matcher import KeywordIndex, jaccard, SIMILARITY_THRESHOLD, MAX_ROOM_SIZE, MATCH_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# (日記ID, 感情タグ, 投稿時刻, 語彙IDの集合)
+UnmatchedDiary = Tuple[str, Optional[str], datetime, Set[int]]
+
+
+class DiariesAlreadyMatched(Exception):
+    """ルームを作ろうとした日記の一部が、別のプロセスや一括マッチングで既にマッチしていた"""
+
+    def __init__(self, diary_ids: Iterable[str]):
+        self.diary_ids = set(diary_ids)
+        super().__init__(f"Diaries already matched: {sorted(self.diary_ids)}")
+
+
+@dataclass
+class PoolEntry:
+    diary_id: str
+    emotion: str
+    created_at: datetime
+    words: Set[int] = field(default_factory=set)  # キーワードの語彙ID
+
+
+class EmotionPool:
+    """感情ごとの未マッチ日記プール（投稿時刻順）"""
+
+    def __init__(self):
+        self.times: List[datetime] = []
+        self.ids: List[str] = []
+        self.entries: Dict[str, PoolEntry] = {}
+        self.index = KeywordIndex()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry: PoolEntry):
+        i = bisect_right(self.times, entry.created_at)
+        self.times.insert(i, entry.created_at)
+        self.ids.insert(i, entry.diary_id)
+        self.entries[entry.diary_id] = entry
+        self.index.add(entry.diary_id, entry.words)
+
+    def remove(self, entry: PoolEntry):
+        lo = bisect_left(self.times, entry.created_at)
+        hi = bisect_right(self.times, entry.created_at)
+        for i in range(lo, hi):
+            if self.ids[i] == entry.diary_id:
+                del self.times[i]
+                del self.ids[i]
+                break
+        self.entries.pop(entry.diary_id, None)
+        self.index.remove(entry.diary_id)
+
+    def evict_before(self, cutoff: datetime) -> int:
+        """cutoff より前に投稿された日記をプールから外す"""
+        count = bisect_left(self.times, cutoff)
+        for diary_id in self.ids[:count]:
+            self.entries.pop(diary_id, None)
+            self.index.remove(diary_id)
+        del self.times[:count]
+        del self.ids[:count]
+        return count
+
+    def within(self, start: datetime, end: datetime) -> Set[str]:
+        """投稿時刻が [start, end] に入る日記ID"""
+        lo = bisect_left(self.times, start)
+        hi = bisect_right(self.times, end)
+        return set(self.ids[lo:hi])
+
+
+class IncrementalMatcher:
+    """日記の到着ごとにマッチングを行う常駐マッチャー
+
+    感情ごとに未マッチ日記のプールを持ち、±2時間の窓から外れた日記を
+    追い出しながら、新しい日記をプール内の日記と照合する。
+
+    プールはプロセスごとに持つため、起動時と resync_interval ごとにDBの
+    未マッチ日記と突き合わせる。他のプロセスで到着した日記はマッチングにかけてから
+    プールに入れ、他でマッチ済みになった日記はプールから外す。ルームの作成時には
+    on_match が matched フラグを条件付きで立てるため、同じ日記が2つのルームに入ることはない。
+    """
+
+    def __init__(
+        self,
+        window: timedelta = MATCH_WINDOW,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_size: int = MAX_ROOM_SIZE,
+        resync_interval: float = settings.INCREMENTAL_MATCH_RESYNC_S,
+    ):
+        self.window = window
+        self.threshold = threshold
+        self.max_size = max_size
+        self.resync_interval = resync_interval
+        self.pools: Dict[str, EmotionPool] = {}
+        self.on_match: Optional[Callable[[List[str], List[int]], object]] = None
+        self.load_unmatched: Optional[Callable[[datetime], List[UnmatchedDiary]]] = None
+        self.on_room_created: Optional[Callable[[object], Awaitable[None]]] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._resync_task: Optional[asyncio.Task] = None
+
+    async def start(
+        self,
+        on_match: Callable[[List[str], List[int]], object],
+        load_unmatched: Optional[Callable[[datetime], List[UnmatchedDiary]]] = None,
+        on_room_created: Optional[Callable[[object], Awaitable[None]]] = None,
+    ):
+        """プールをDBから組み立て、バックグラウンドのマッチングループを開始
+
+        on_match は (日記ID, 共通の語彙ID) からルームを作成して返す（スレッドで実行）。
+        load_unmatched は指定時刻以降の未マッチ日記を返し、on_room_created は
+        作成したルームを参加者に通知する。
+        """
+        if self._task is not None:
+            return
+        self.on_match = on_match
+        self.load_unmatched = load_unmatched
+        self.on_room_created = on_room_created
+        self._queue = asyncio.Queue()
+        if load_unmatched is not None:
+            try:
+                queued = await self.resync()
+                logger.info(f"Incremental matcher queued {queued} unmatched diaries from the database")
+            except Exception as e:
+                # 読み込めなくても到着した日記のマッチングは始め、次の resync で取り込む
+                logger.error(f"Failed to load unmatched diaries: {e}")
+            self._resync_task = asyncio.create_task(self._resync_loop())
+        self._task = asyncio.create_task(self._run())
+        logger.info("Incremental matcher started")
+
+    async def stop(self):
+        """マッチングループを停止"""
+        if self._task is None:
+            return
+        for task in (self._resync_task, self._task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._resync_task = None
+        self._queue = None
+        logger.info("Incremental matcher stopped")
+
+    async def resync(self, now: Optional[datetime] = None) -> int:
+        """DBの未マッチ日記とプールを突き合わせ、プールにない日記をマッチング待ちに入れる"""
+        now = now or datetime.utcnow()
+        unmatched = await asyncio.to_thread(self.load_unmatched, now - self.window)
+        unmatched_ids = {diary_id for diary_id, _, _, _ in unmatched}
+
+        # 他のプロセスや一括マッチングでマッチ済みになった日記を外す
+        for pool in self.pools.values():
+            for entry in [e for e in pool.entries.values() if e.diary_id not in unmatched_ids]:
+                pool.remove(entry)
+
+        pooled = {diary_id for pool in self.pools.values() for diary_id in pool.entries}
+        queued = 0
+        for diary_id, emotion, created_at, words in sorted(unmatched, key=lambda d: (d[2], d[0])):
+            if diary_id not in pooled:
+                await self._queue.put(PoolEntry(diary_id, emotion, created_at, set(words)))
+                queued += 1
+        return queued
+
+    async def _resync_loop(self):
+        while True:
+            await asyncio.sleep(self.resync_interval)
+            try:
+                await self.resync()
+            except Exception as e:
+                logger.error(f"Incremental matcher resync failed: {e}")
+
+    async def submit(self, diary_id: str, emotion: str, created_at: datetime, words: Set[int]):
+        """キーワード抽出の済んだ日記をマッチング待ちに追加"""
+        if self._queue is None:
+            logger.warning(f"Incremental matcher is not running; diary {diary_id} was not queued")
+            return
+        await self._queue.put(PoolEntry(diary_id, emotion, created_at, set(words)))
+
+    def match(self, entry: PoolEntry, now: Optional[datetime] = None) -> Optional[List[PoolEntry]]:
+        """新しい日記をプールと照合し、マッチしたメンバーを返す
+
+        マッチしなければ日記をプールに入れて None を返す。
+        """
+        pool = self.pools.setdefault(entry.emotion, EmotionPool())
+        now = max(now or datetime.utcnow(), entry.created_at)
+        pool.evict_before(now - self.window)
+        if entry.created_at < now - self.window or entry.diary_id in pool.entries:
+            return None
+
+        # 新しい日記をアンカーとし、窓内で共通語を持つ日記を投稿時刻順に評価
+        candidates = pool.index.candidates_for(entry.words, self.threshold)
+        candidates &= pool.within(entry.created_at - self.window, entry.created_at + self.window)
+
+        matches = [entry]
+        for other in sorted((pool.entries[c] for c in candidates), key=lambda e: (e.created_at, e.diary_id)):
+            if jaccard(entry.words, other.words) >= self.threshold:
+                matches.append(other)
+            if len(matches) >= self.max_size:
+                break
+
+        if len(matches) < 2:
+            pool.add(entry)
+            return None
+
+        for other in matches[1:]:
+            pool.remove(other)
+        return matches
+
+    async def _run(self):
+        while True:
+            entry = await self._queue.get()
+            try:
+                matches = self.match(entry)
+                if matches:
+                    await self._create_room(matches)
+            except Exception as e:
+                logger.error(f"Incremental matching error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _create_room(self, matches: List[PoolEntry]):
+        diary_ids = [m.diary_id for m in matches]
+        try:
+            room = await asyncio.to_thread(self.on_match, diary_ids, sorted(matches[0].words))
+        except DiariesAlreadyMatched as e:
+            # マッチ済みの日記は捨て、残りはプールに戻して次の日記を待つ
+            for m in matches:
+                if m.diary_id not in e.diary_ids:
+                    self.pools[m.emotion].add(m)
+            logger.info(f"Skipped a room: {len(e.diary_ids)} diaries were matched elsewhere")
+            return
+        except Exception:
+            # 保存に失敗したメンバーはプールに戻して次の日記を待つ
+            for m in matches:
+                self.pools[m.emotion].add(m)
+            raise
+
+        if self.on_room_created is not None:
+            try:
+                await self.on_room_created(room)
+            except Exception as e:
+                logger.error(f"Failed to notify room {getattr(room, 'id', None)}: {e}")
+
+
+incremental_matcher = IncrementalMatcher()
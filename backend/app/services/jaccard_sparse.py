@@ -0,0 +1,105 @@
+from typing import Dict, Hashable, Iterator, List, Optional, Sequence, Set, Tuple
+
+# NumPy / SciPy はベクトル化バックエンドを使う場合のみ必要
+try:
+    import numpy as np
+    from scipy.sparse import csr_matrix
+except ImportError:
+    np = None
+    csr_matrix = None
+
+# 一度に積を計算する行数（中間行列のメモリを抑える）
+BLOCK_SIZE = 1024
+
+
+def is_available() -> bool:
+    """NumPy / SciPy が使えるか"""
+    return np is not None and csr_matrix is not None
+
+
+def build_matrix(keyword_sets: Sequence[Set[Hashable]]):
+    """キーワードを語彙IDに変換し、日記 × 語彙 の0/1 CSR行列を作る"""
+    vocabulary: Dict[Hashable, int] = {}
+    indptr = [0]
+    indices: List[int] = []
+    for keywords in keyword_sets:
+        for word in keywords:
+            indices.append(vocabulary.setdefault(word, len(vocabulary)))
+        indptr.append(len(indices))
+
+    data = np.ones(len(indices), dtype=np.int32)
+    return csr_matrix(
+        (data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(keyword_sets), len(vocabulary)),
+    )
+
+
+def _similar_blocks(
+    keyword_sets: Sequence[Set[Hashable]],
+    threshold: float,
+    block_size: int,
+    stats: Optional[Dict[str, int]],
+) -> Iterator[Tuple["np.ndarray", "np.ndarray", "np.ndarray"]]:
+    """行ブロックごとに、類似度が閾値以上のペア (i, j, 類似度) を j > i で返す
+
+    交差数は行ブロックごとの疎行列積でまとめて求め、
+    和集合の大きさは |A| + |B| - |A∩B| から計算する。
+    """
+    if not is_available():
+        raise RuntimeError("numpy and scipy are required for the sparse Jaccard backend")
+
+    n = len(keyword_sets)
+    if n == 0:
+        return
+
+    matrix = build_matrix(keyword_sets)
+    sizes = np.diff(matrix.indptr)
+    transposed = matrix.T.tocsr()
+
+    for start in range(0, n, block_size):
+        # 共通語を持つペアだけが非ゼロとして残る
+        intersections = (matrix[start:start + block_size] @ transposed).tocoo()
+        rows = intersections.row.astype(np.int64) + start
+        cols = intersections.col.astype(np.int64)
+        counts = intersections.data.astype(np.int64)
+
+        later = cols > rows
+        rows, cols, counts = rows[later], cols[later], counts[later]
+        if stats is not None:
+            stats["pairs_scored"] = stats.get("pairs_scored", 0) + len(rows)
+
+        # 純Python版と同じ int / int の除算結果になるよう float64 で計算
+        unions = sizes[rows] + sizes[cols] - counts
+        similarities = counts / unions
+        similar = similarities >= threshold
+        yield rows[similar], cols[similar], similarities[similar]
+
+
+def similar_pairs(
+    keyword_sets: Sequence[Set[Hashable]],
+    threshold: float,
+    block_size: int = BLOCK_SIZE,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[List[int]]:
+    """各日記 i について、Jaccard類似度が閾値以上の後続 j (> i) を昇順で返す
+
+    stats を渡すと、類似度を計算したペア数を "pairs_scored" に加算する。
+    """
+    adjacency: List[List[int]] = [[] for _ in range(len(keyword_sets))]
+    for rows, cols, _ in _similar_blocks(keyword_sets, threshold, block_size, stats):
+        for i in np.lexsort((cols, rows)):
+            adjacency[rows[i]].append(int(cols[i]))
+    return adjacency
+
+
+def similar_edges(
+    keyword_sets: Sequence[Set[Hashable]],
+    threshold: float,
+    block_size: int = BLOCK_SIZE,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[Tuple[float, int, int]]:
+    """類似度が閾値以上のペアを (類似度, i, j) の辺リストとして返す"""
+    edges: List[Tuple[float, int, int]] = []
+    for rows, cols, similarities in _similar_blocks(keyword_sets, threshold, block_size, stats):
+        edges.extend(zip(similarities.tolist(), rows.tolist(), cols.tolist()))
+    return edges
@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import base64
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# SQLiteキャッシュの件数を上限まで削る間隔（書き込み件数）
+DISK_EVICT_EVERY = 100
+
+AnalysisResult = Tuple[List[Dict], Optional[bytes]]
+
+
+def normalize_text(text: str) -> str:
+    """キャッシュキー用にテキストを正規化（NFKC・空白の統一）"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class KeywordCache:
+    """抽出済みキーワードのLRUキャッシュ
+
+    正規化したテキストとモデルのバージョンのハッシュをキーにする。
+    disk_path を指定すると SQLite の2段目を持ち、再起動後も結果を再利用する。
+    2段目は最後に使われた時刻（last_used）を持ち、DISK_EVICT_EVERY 件書き込むごとに
+    古いものから削除して disk_max_size 件に収める。
+    スレッド間はロックで保護し、ワーカープロセス間では SQLite を共有する。
+    """
+
+    def __init__(
+        self,
+        model_version: str,
+        max_size: int = 10000,
+        disk_path: Optional[str] = None,
+        disk_max_size: int = 100000,
+    ):
+        self.model_version = model_version
+        self.max_size = max_size
+        self.disk_max_size = disk_max_size
+        self._disk_writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, AnalysisResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        if disk_path:
+            self._open_disk(disk_path)
+
+    def _open_disk(self, path: str):
+        try:
+            self._disk = sqlite3.connect(path, timeout=5, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS keyword_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._disk.execute("PRAGMA table_info(keyword_cache)")}
+            if "last_used" not in columns:
+                # last_used のない旧形式のファイル（既存の行は最も古いものとして扱う）
+                self._disk.execute("ALTER TABLE keyword_cache ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            self._disk.execute("CREATE INDEX IF NOT EXISTS ix_keyword_cache_last_used ON keyword_cache (last_used)")
+            # 上限を下げて再起動した場合も、開いた時点で収める
+            self._evict_disk()
+            self._disk.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Keyword disk cache disabled: {e}")
+            self._disk = None
+
+    def key(self, text: str) -> str:
+        """モデルのバージョンと正規化したテキストからキーを作る"""
+        payload = f"{self.model_version}\0{normalize_text(text)}"
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, text: str) -> Optional[AnalysisResult]:
+        """キャッシュから解析結果を取得（なければ None）"""
+        key = self.key(text)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            elif self._disk is not None:
+                result = self._load(key)
+                if result is not None:
+                    self._remember(key, result)
+
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return _copy(result)
+
+    def put(self, text: str, result: AnalysisResult):
+        """解析結果をキャッシュに保存"""
+        key = self.key(text)
+        result = _copy(result)
+        with self._lock:
+            self._remember(key, result)
+            if self._disk is not None:
+                self._store(key, result)
+
+    def stats(self) -> Dict:
+        """ヒット率などの統計"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "disk": self._disk is not None,
+                "disk_max_size": self.disk_max_size,
+            }
+
+    def _remember(self, key: str, result: AnalysisResult):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[AnalysisResult]:
+        try:
+            row = self._disk.execute("SELECT value FROM keyword_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._disk.execute("UPDATE keyword_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._disk.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Keyword disk cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        value = json.loads(row[0])
+        embedding = base64.b64decode(value["embedding"]) if value["embedding"] else None
+        return value["keywords"], embedding
+
+    def _store(self, key: str, result: AnalysisResult):
+        keywords, embedding = result
+        value = {
+            "keywords": keywords,
+            "embedding": base64.b64encode(embedding).decode() if embedding else None,
+        }
+        try:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO keyword_cache (key, value, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+            self._disk_writes += 1
+            if self._disk_writes % DISK_EVICT_EVERY == 0:
+                self._evict_disk()
+            self._disk.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Keyword disk cache write failed: {e}")
+
+    def _evict_disk(self):
+        """最近使われた disk_max_size 件を残し、それより古い行を削除"""
+        self._disk.execute(
+            "DELETE FROM keyword_cache WHERE key IN "
+            "(SELECT key FROM keyword_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_size,),
+        )
+
+
+def _copy(result: AnalysisResult) -> AnalysisResult:
+    """呼び出し元での変更がキャッシュに波及しないようにコピー"""
+    keywords, embedding = result
+    return [dict(keyword) for keyword in keywords], embedding
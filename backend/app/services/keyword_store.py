@@ -0,0 +1,208 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import struct
+import threading
+
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.models import ParsedKeyword, Vocabulary
+from app.db.session import SessionLocal
+
+# 形式1: 1キーワード = 語彙ID (uint32) + 重要度 (float32) の8バイト。ヘッダなし
+KEYWORD_PAIR = struct.Struct("<If")
+# 形式2: 先頭1バイトのバージョンに続き、1キーワード = 語彙ID (uint32) + 重要度 (float32)
+# + 表層形の語彙ID (uint32) + 出現頻度 (uint16) + 品詞コード (uint8) + 詰め物の16バイト。
+# 全体の長さが 8 の倍数 + 1 になるため、形式1（8 の倍数）と取り違えない
+KEYWORD_RECORD = struct.Struct("<IfIHBx")
+FORMAT_V2 = 2
+# 品詞コード（Universal Dependencies の品詞と spaCy の SPACE）
+POS_CODES = (
+    "", "ADJ", "ADP", "ADV", "AUX", "CCONJ", "DET", "INTJ", "NOUN", "NUM",
+    "PART", "PRON", "PROPN", "PUNCT", "SCONJ", "SYM", "VERB", "X", "SPACE",
+)
+POS_CODE = {pos: code for code, pos in enumerate(POS_CODES)}
+MAX_FREQUENCY = 0xFFFF
+# 語彙の登録が他のプロセスと競合した場合の再試行回数
+INTERN_RETRIES = 3
+
+
+class VocabularyCache:
+    """キーワードの語（原形と表層形）と語彙IDの対応表
+
+    一度割り当てたIDは変わらないため、引いた結果はプロセス内に保持する。
+    未登録の語は専用のセッションで登録してすぐコミットし、呼び出し元の
+    トランザクションがロールバックされてもIDが無効にならないようにする。
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._words: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def intern(self, words: Iterable[str]) -> Dict[str, int]:
+        """語ごとの語彙IDを返す（未登録の語は登録する）"""
+        words = list(dict.fromkeys(words))
+        missing = [word for word in words if word not in self._ids]
+        if missing:
+            self._register(missing)
+        return {word: self._ids[word] for word in words}
+
+    def lookup(self, word_ids: Iterable[int]) -> Dict[int, str]:
+        """語彙IDごとの原形を返す（存在しないIDは含まない）"""
+        word_ids = list(dict.fromkeys(word_ids))
+        missing = [word_id for word_id in word_ids if word_id not in self._words]
+        if missing:
+            db = SessionLocal()
+            try:
+                self._remember(db.query(Vocabulary.id, Vocabulary.word).filter(Vocabulary.id.in_(missing)).all())
+            finally:
+                db.close()
+        return {word_id: self._words[word_id] for word_id in word_ids if word_id in self._words}
+
+    def clear(self):
+        """保持している対応表を捨てる（語彙テーブルを作り直した後に呼ぶ）"""
+        with self._lock:
+            self._ids.clear()
+            self._words.clear()
+
+    def _register(self, words: List[str]):
+        db = SessionLocal()
+        try:
+            for _ in range(INTERN_RETRIES):
+                self._remember(db.query(Vocabulary.id, Vocabulary.word).filter(Vocabulary.word.in_(words)).all())
+                words = [word for word in words if word not in self._ids]
+                if not words:
+                    return
+                try:
+                    db.execute(insert(Vocabulary).values([{"word": word} for word in words]))
+                    db.commit()
+                except IntegrityError:
+                    # 別のプロセスが同じ語を先に登録した。読み直して残りを登録する
+                    db.rollback()
+            raise RuntimeError(f"Failed to intern {len(words)} words into the vocabulary")
+        finally:
+            db.close()
+
+    def _remember(self, rows: Iterable[Tuple[int, str]]):
+        with self._lock:
+            for word_id, word in rows:
+                self._ids[word] = word_id
+                self._words[word_id] = word
+
+
+vocabulary = VocabularyCache()
+
+
+def pack_keywords(keywords: List[Dict]) -> bytes:
+    """抽出結果を形式2の packed 配列に変換（重要度の高い順を保つ）
+
+    原形と表層形は語彙IDで、品詞はコードで持ち、APIの keywords の形
+    （word / original / pos / importance_score / frequency）をそのまま戻せるようにする。
+    """
+    word_ids = vocabulary.intern(
+        word
+        for keyword in keywords
+        for word in (keyword["word"], keyword.get("original") or keyword["word"])
+    )
+    seen: Set[int] = set()
+    data = bytearray([FORMAT_V2])
+    for keyword in keywords:
+        word_id = word_ids[keyword["word"]]
+        if word_id in seen:
+            continue
+        seen.add(word_id)
+        data += KEYWORD_RECORD.pack(
+            word_id,
+            keyword["importance_score"],
+            word_ids[keyword.get("original") or keyword["word"]],
+            min(keyword.get("frequency", 1), MAX_FREQUENCY),
+            POS_CODE.get(keyword.get("pos", ""), POS_CODE["X"]),
+        )
+    return bytes(data)
+
+
+def unpack_keyword_records(data: Optional[bytes]) -> List[Tuple[int, float, Optional[int], Optional[str], Optional[int]]]:
+    """packed 配列を (語彙ID, 重要度, 表層形の語彙ID, 品詞, 出現頻度) のリストに戻す
+
+    形式1の配列には表層形・品詞・出現頻度がないため None を入れる。
+    """
+    if not data:
+        return []
+    if len(data) % KEYWORD_PAIR.size == 0:
+        return [(word_id, score, None, None, None) for word_id, score in KEYWORD_PAIR.iter_unpack(data)]
+    if data[0] != FORMAT_V2:
+        raise ValueError(f"Unknown packed keyword format: {data[0]}")
+    return [
+        (word_id, score, original_id, POS_CODES[pos] if pos < len(POS_CODES) else "X", frequency)
+        for word_id, score, original_id, frequency, pos in KEYWORD_RECORD.iter_unpack(data[1:])
+    ]
+
+
+def unpack_keywords(data: Optional[bytes]) -> List[Tuple[int, float]]:
+    """packed 配列を (語彙ID, 重要度) のリストに戻す（形式1・2のどちらも読める）"""
+    return [(word_id, score) for word_id, score, _, _, _ in unpack_keyword_records(data)]
+
+
+def keyword_id_set(data: Optional[bytes]) -> Set[int]:
+    """マッチング用の語彙IDの集合"""
+    return {word_id for word_id, _ in unpack_keywords(data)}
+
+
+def keywords_for_api(data: Optional[bytes]) -> List[Dict]:
+    """packed 配列をAPIの keywords の形に戻す
+
+    形式2は抽出時と同じ word / original / pos / importance_score / frequency を返す。
+    形式1（reindex_keywords で再解析する前の日記）は word / importance_score だけを返す。
+    """
+    records = unpack_keyword_records(data)
+    words = vocabulary.lookup(
+        vocabulary_id
+        for word_id, _, original_id, _, _ in records
+        for vocabulary_id in (word_id, original_id)
+        if vocabulary_id is not None
+    )
+    keywords = []
+    for word_id, score, original_id, pos, frequency in records:
+        if word_id not in words:
+            continue
+        if original_id is None:
+            keywords.append({"word": words[word_id], "importance_score": round(score, 4)})
+            continue
+        keywords.append({
+            "word": words[word_id],
+            "original": words.get(original_id, words[word_id]),
+            "pos": pos,
+            "importance_score": round(score, 4),
+            "frequency": frequency,
+        })
+    return keywords
+
+
+def replace_parsed_keywords(db: Session, diaries: Iterable[Tuple[str, Optional[datetime], List[Dict]]]):
+    """日記ごとのキーワードを parsed_keywords に書き込む（コミットは呼び出し元）
+
+    diaries は (日記ID, 投稿時刻, キーワード) の並び。既存の行を1回のDELETEで消し、
+    新しい行を1回の複数行INSERTで入れるため、再解析しても重複しない。
+    created_at には日記の投稿時刻を入れ、(word, created_at) のインデックスで
+    時間窓を絞った検索ができるようにする。
+    """
+    diaries = list(diaries)
+    if not diaries:
+        return
+
+    rows = [
+        {
+            "diary_id": diary_id,
+            "word": keyword["word"],
+            "frequency": keyword.get("frequency", 1),
+            "created_at": created_at or datetime.utcnow(),
+        }
+        for diary_id, created_at, keywords in diaries
+        for keyword in keywords
+    ]
+
+    db.execute(delete(ParsedKeyword).where(ParsedKeyword.diary_id.in_([d[0] for d in diaries])))
+    if rows:
+        db.execute(insert(ParsedKeyword).values(rows))
@@ -1,6 +1,14 @@
+from datetime import datetime, timedelta
 from app.services.notifier import notify_user
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+from app.core.socket import sio
 from app.db import crud
+from app.db.models import ChatRoom, Diary
+from app.db.session import SessionLocal
+from app.schemas.chat_room import ChatRoomCreate
+from app.services.incremental_matcher import DiariesAlreadyMatched, UnmatchedDiary
+from app.services.keyword_store import keyword_id_set, vocabulary
 
 def match_and_create_room(db: Session, matched_users: list[str]):
     # 1. ルームをDBに作成
@@ -10,4 +18,72 @@ def match_and_create_room(db: Session, matched_users: list[str]):
     for token in matched_users:
         notify_user(db, user_token=token, event_type="room_created")
 
-    return room
\ No newline at end of file
+    return room
+
+def create_room_for_diaries(diary_ids: list[str], word_ids: list[int]) -> ChatRoom:
+    """逐次マッチングで成立した日記グループのチャットルームを作成
+
+    一括マッチングと同じ matched フラグを条件付きで立て、ルームの作成と同じ
+    トランザクションで反映する。既にマッチ済みの日記があれば何も反映せずに
+    DiariesAlreadyMatched を送出する。作成後、参加者ごとに通知を保存する。
+    """
+    words = vocabulary.lookup(word_ids)
+    db = SessionLocal()
+    try:
+        updated = db.execute(
+            update(Diary)
+            .where(Diary.id.in_(diary_ids), Diary.matched.is_(False))
+            .values(matched=True)
+        ).rowcount
+        if updated != len(diary_ids):
+            db.rollback()
+            matched = db.query(Diary.id).filter(Diary.id.in_(diary_ids), Diary.matched.is_(True)).all()
+            raise DiariesAlreadyMatched(diary_id for diary_id, in matched)
+
+        room = ChatRoomCreate(
+            participants=diary_ids,
+            empathy_words=[words[word_id] for word_id in word_ids if word_id in words],
+            expires_at=datetime.utcnow() + timedelta(hours=24)
+        )
+        db_room = crud.create_chat_room(db, room)
+        for token in diary_ids:
+            notify_user(db, user_token=token, event_type="room_created")
+        # 通知の保存でコミットされた属性を読み直してからセッションを閉じる
+        db.refresh(db_room)
+        return db_room
+    finally:
+        db.close()
+
+def load_unmatched_diaries(since: datetime) -> list[UnmatchedDiary]:
+    """逐次マッチャーのプールを組み立てるための、since 以降の未マッチ日記"""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Diary.id, Diary.emotion_tag, Diary.created_at, Diary.keyword_ids)
+            .filter(
+                Diary.created_at >= since,
+                Diary.matched.is_(False),
+                # 感情タグのない日記は到着時にもマッチングにかけない（NLPジョブの submit と同じ条件）
+                Diary.emotion_tag.isnot(None),
+                Diary.keyword_ids.isnot(None),
+            )
+            .order_by(Diary.created_at, Diary.id)
+            .all()
+        )
+        return [
+            (diary_id, emotion, created_at, keyword_id_set(data))
+            for diary_id, emotion, created_at, data in rows
+        ]
+    finally:
+        db.close()
+
+async def notify_room_created(room: ChatRoom):
+    """ルームの成立を参加者の Socket.io ルーム（日記ID）に送る"""
+    payload = {
+        "room_id": room.id,
+        "participants": room.participants,
+        "empathy_words": room.empathy_words,
+        "expires_at": room.expires_at.isoformat(),
+    }
+    for diary_id in room.participants:
+        await sio.emit("room_created", payload, room=diary_id)
@@ -0,0 +1,304 @@
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+
+from sqlalchemy import insert, tuple_, update
+
+from app.db.models import ChatRoom, Diary
+from app.db.session import SessionLocal
+from app.services.embedding import decode_vector
+from app.services.keyword_store import keyword_id_set, vocabulary
+
+logger = logging.getLogger(__name__)
+
+# in_() に渡すIDの最大数（URL長と1レスポンスあたりの行数を抑える）
+KEYWORD_CHUNK_SIZE = 100
+# PostgRESTが1回に返す最大行数
+PAGE_SIZE = 1000
+# マッチングに必要な日記の列
+DIARY_COLUMNS = "id, userid, emotion, create_at"
+
+
+class MatchRepository:
+    """マッチング処理用のSupabaseアクセス層
+
+    1回のマッチング実行の間、読み込んだキーワードを保持し、
+    Supabaseへの往復回数を数える。client は共有の非同期クライアントで、
+    in_() のチャンクは同じ接続プール上で並行して送る。
+    """
+
+    def __init__(self, client, chunk_size: int = KEYWORD_CHUNK_SIZE, page_size: int = PAGE_SIZE):
+        self.client = client
+        self.chunk_size = chunk_size
+        self.page_size = page_size
+        self.round_trips = 0
+        self.keywords: Dict[str, Set[str]] = {}
+        self.vectors: Dict[str, object] = {}
+
+    async def _execute(self, query):
+        """クエリを実行し、往復回数を記録"""
+        self.round_trips += 1
+        return await query.execute()
+
+    async def iter_unmatched_diaries(self, from_time: datetime, to_time: datetime) -> AsyncIterator[List[Dict]]:
+        """期間内の未マッチ日記を、必要な列だけページ単位で取得（1回の応答は page_size 件まで）"""
+        offset = 0
+        while True:
+            response = await self._execute(
+                self.client.table("diary")
+                .select(DIARY_COLUMNS)
+                .or_("matched.is.null,matched.eq.false")
+                .gte("create_at", from_time.isoformat())
+                .lte("create_at", to_time.isoformat())
+                .order("create_at")
+                .order("id")
+                .range(offset, offset + self.page_size - 1)
+            )
+            if response.data:
+                yield response.data
+            if len(response.data) < self.page_size:
+                break
+            offset += self.page_size
+
+    async def load_keywords(self, diary_ids: Iterable[str]) -> Dict[str, Set[str]]:
+        """日記IDごとのキーワード集合を in_() でまとめて読み込む（チャンクは並行して取得）"""
+        diary_ids = list(diary_ids)
+        missing = [diary_id for diary_id in dict.fromkeys(diary_ids) if diary_id not in self.keywords]
+        for diary_id in missing:
+            self.keywords[diary_id] = set()
+
+        await asyncio.gather(*[
+            self._load_keyword_chunk(missing[start:start + self.chunk_size])
+            for start in range(0, len(missing), self.chunk_size)
+        ])
+        return {diary_id: self.keywords[diary_id] for diary_id in diary_ids}
+
+    async def _load_keyword_chunk(self, chunk: List[str]):
+        offset = 0
+        while True:
+            response = await self._execute(
+                self.client.table("parsed_keyword")
+                .select("diaryid, word")
+                .in_("diaryid", chunk)
+                .order("id")
+                .range(offset, offset + self.page_size - 1)
+            )
+            for row in response.data:
+                self.keywords[row["diaryid"]].add(row["word"])
+            if len(response.data) < self.page_size:
+                break
+            offset += self.page_size
+
+    async def load_vectors(self, diary_ids: Iterable[str]) -> Dict[str, object]:
+        """日記IDごとの文書ベクトルを in_() でまとめて読み込む（未計算の日記は None）"""
+        diary_ids = list(diary_ids)
+        missing = [diary_id for diary_id in dict.fromkeys(diary_ids) if diary_id not in self.vectors]
+        for diary_id in missing:
+            self.vectors[diary_id] = None
+
+        responses = await asyncio.gather(*[
+            self._execute(
+                self.client.table("diary")
+                .select("id, embedding")
+                .in_("id", missing[start:start + self.chunk_size])
+            )
+            for start in range(0, len(missing), self.chunk_size)
+        ])
+        for response in responses:
+            for row in response.data:
+                self.vectors[row["id"]] = decode_vector(row.get("embedding"))
+
+        return {diary_id: self.vectors[diary_id] for diary_id in diary_ids}
+
+    async def commit_rooms(self, rooms: List[Dict], diary_ids: Iterable[str]):
+        """チャットルームの一括作成とmatchedフラグの一括更新
+
+        ルームは1回のbulk insert、フラグは in_() による更新で反映する。
+        フラグ更新に失敗した場合は作成したルームとフラグを元に戻し、
+        途中までマッチ済みになった状態を残さない。
+        """
+        if not rooms:
+            return
+
+        rooms = [
+            {
+                "participants": json.dumps(room["participants"]),
+                "empathy_words": json.dumps(room["empathy_words"]),
+                "expires_at": room["expires_at"].isoformat(),
+            }
+            for room in rooms
+        ]
+        response = await self._execute(self.client.table("chat_rooms").insert(rooms))
+        room_ids = [room["id"] for room in response.data]
+
+        diary_ids = list(dict.fromkeys(diary_ids))
+        # 取り消す前に全チャンクの更新が終わるのを待つ
+        results = await asyncio.gather(*[
+            self._execute(
+                self.client.table("diary")
+                .update({"matched": True})
+                .in_("id", diary_ids[start:start + self.chunk_size])
+            )
+            for start in range(0, len(diary_ids), self.chunk_size)
+        ], return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.error(f"Failed to mark diaries as matched, rolling back {len(room_ids)} rooms: {errors[0]}")
+            await self._rollback(room_ids, diary_ids)
+            raise errors[0]
+
+    async def _rollback(self, room_ids: List, diary_ids: List[str]):
+        """commit_rooms の途中失敗を取り消す"""
+        for start in range(0, len(diary_ids), self.chunk_size):
+            await self._execute(
+                self.client.table("diary")
+                .update({"matched": None})
+                .in_("id", diary_ids[start:start + self.chunk_size])
+            )
+        if room_ids:
+            await self._execute(self.client.table("chat_rooms").delete().in_("id", room_ids))
+
+
+class LocalMatchRepository:
+    """マッチング処理用のローカルDB（SQLAlchemy）アクセス層
+
+    NLPジョブが書き込む diaries を読み、ルームの作成と
+    diaries.matched の更新を1つのトランザクションで行う。逐次マッチャーも
+    同じ matched フラグを使うため、どちらが先にマッチさせても二重にならない。
+    DB操作はスレッドで実行し、MatchRepository と同じ非同期のインターフェースを持つ。
+    キーワードは逐次マッチャーと同じ語彙IDの集合（diaries.keyword_ids）で比較し、
+    ルームの empathy_words を保存するときに語へ戻す。
+
+    ローカルの日記にはユーザーIDがないため、作成するルームの participants は
+    MatchRepository（ユーザーID）と異なり日記IDになる。MATCH_SOURCE=local で使う。
+    """
+
+    def __init__(self, chunk_size: int = KEYWORD_CHUNK_SIZE, page_size: int = PAGE_SIZE):
+        self.chunk_size = chunk_size
+        self.page_size = page_size
+        self.round_trips = 0
+        self.keywords: Dict[str, Set[int]] = {}
+        self.vectors: Dict[str, object] = {}
+
+    async def iter_unmatched_diaries(self, from_time: datetime, to_time: datetime) -> AsyncIterator[List[Dict]]:
+        """期間内でキーワード抽出済みの未マッチ日記を (created_at, id) のキーセット順に取得"""
+        after: Optional[Tuple[datetime, str]] = None
+        while True:
+            rows = await asyncio.to_thread(self._unmatched_page, from_time, to_time, after)
+            if rows:
+                # 匿名の日記なので、参加者は日記IDで表す（逐次マッチャーと同じ）
+                yield [
+                    {"id": diary_id, "userid": diary_id, "emotion": emotion, "create_at": created_at.isoformat()}
+                    for diary_id, emotion, created_at in rows
+                ]
+            if len(rows) < self.page_size:
+                break
+            after = (rows[-1][2], rows[-1][0])
+
+    async def load_keywords(self, diary_ids: Iterable[str]) -> Dict[str, Set[int]]:
+        """日記IDごとの語彙IDの集合を diaries.keyword_ids から読み込む"""
+        diary_ids = list(diary_ids)
+        missing = [diary_id for diary_id in dict.fromkeys(diary_ids) if diary_id not in self.keywords]
+        for diary_id in missing:
+            self.keywords[diary_id] = set()
+
+        for start in range(0, len(missing), self.chunk_size):
+            rows = await asyncio.to_thread(self._keyword_id_rows, missing[start:start + self.chunk_size])
+            for diary_id, data in rows:
+                self.keywords[diary_id] = keyword_id_set(data)
+
+        return {diary_id: self.keywords[diary_id] for diary_id in diary_ids}
+
+    async def load_vectors(self, diary_ids: Iterable[str]) -> Dict[str, object]:
+        """日記IDごとの文書ベクトルを diaries.embedding から読み込む（未計算の日記は None）"""
+        diary_ids = list(diary_ids)
+        missing = [diary_id for diary_id in dict.fromkeys(diary_ids) if diary_id not in self.vectors]
+        for diary_id in missing:
+            self.vectors[diary_id] = None
+
+        for start in range(0, len(missing), self.chunk_size):
+            rows = await asyncio.to_thread(self._vector_rows, missing[start:start + self.chunk_size])
+            for diary_id, value in rows:
+                self.vectors[diary_id] = decode_vector(value)
+
+        return {diary_id: self.vectors[diary_id] for diary_id in diary_ids}
+
+    async def commit_rooms(self, rooms: List[Dict], diary_ids: Iterable[str]):
+        """チャットルームの一括作成とmatchedフラグの更新（同じトランザクション）
+
+        実行中に逐次マッチャーが一部の日記をマッチさせていた場合は
+        何も反映せずに RuntimeError を送出する（次回の実行で残りをマッチさせる）。
+        """
+        if not rooms:
+            return
+        await asyncio.to_thread(self._commit_rooms, rooms, list(dict.fromkeys(diary_ids)))
+
+    # --- 以下はスレッドで実行するDB操作 ---
+
+    def _unmatched_page(
+        self,
+        from_time: datetime,
+        to_time: datetime,
+        after: Optional[Tuple[datetime, str]],
+    ) -> List[Tuple[str, Optional[str], datetime]]:
+        self.round_trips += 1
+        db = SessionLocal()
+        try:
+            query = (
+                db.query(Diary.id, Diary.emotion_tag, Diary.created_at)
+                .filter(
+                    Diary.created_at >= from_time,
+                    Diary.created_at <= to_time,
+                    Diary.matched.is_(False),
+                    Diary.keyword_ids.isnot(None),
+                )
+            )
+            if after is not None:
+                query = query.filter(tuple_(Diary.created_at, Diary.id) > tuple_(*after))
+            return query.order_by(Diary.created_at, Diary.id).limit(self.page_size).all()
+        finally:
+            db.close()
+
+    def _keyword_id_rows(self, diary_ids: List[str]) -> List[Tuple[str, Optional[bytes]]]:
+        self.round_trips += 1
+        db = SessionLocal()
+        try:
+            return db.query(Diary.id, Diary.keyword_ids).filter(Diary.id.in_(diary_ids)).all()
+        finally:
+            db.close()
+
+    def _vector_rows(self, diary_ids: List[str]) -> List[Tuple[str, Optional[bytes]]]:
+        self.round_trips += 1
+        db = SessionLocal()
+        try:
+            return db.query(Diary.id, Diary.embedding).filter(Diary.id.in_(diary_ids)).all()
+        finally:
+            db.close()
+
+    def _commit_rooms(self, rooms: List[Dict], diary_ids: List[str]):
+        # 語彙IDの empathy_words を語に戻す（語彙はプロセス内にキャッシュされている）
+        words = vocabulary.lookup(word_id for room in rooms for word_id in room["empathy_words"])
+        rooms = [
+            {**room, "empathy_words": [words[word_id] for word_id in room["empathy_words"] if word_id in words]}
+            for room in rooms
+        ]
+        self.round_trips += 1
+        db = SessionLocal()
+        try:
+            updated = db.execute(
+                update(Diary)
+                .where(Diary.id.in_(diary_ids), Diary.matched.is_(False))
+                .values(matched=True)
+            ).rowcount
+            if updated != len(diary_ids):
+                db.rollback()
+                raise RuntimeError(
+                    f"{len(diary_ids) - updated} of {len(diary_ids)} diaries were matched concurrently; "
+                    f"no rooms were created"
+                )
+            db.execute(insert(ChatRoom).values(rooms))
+            db.commit()
+        finally:
+            db.close()
@@ -0,0 +1,150 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple, Union
+import asyncio
+import logging
+import multiprocessing
+
+from app.core.config import settings
+from app.services.match_repository import LocalMatchRepository, MatchRepository
+from app.services.matcher import GroupingMode, ScoringBackend, plan_rooms, SIMILARITY_THRESHOLD, MAX_ROOM_SIZE, MATCH_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# チャットルームの有効期間
+ROOM_LIFETIME = timedelta(hours=24)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+Repository = Union[LocalMatchRepository, MatchRepository]
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """感情グループを処理するプロセスプールを取得"""
+    global _executor
+    if _executor is None:
+        # スレッド（HTTPクライアント・NLPプールの管理など）が動くプロセスから fork しないよう spawn で起動する
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.MATCH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor():
+    """プロセスプールを終了"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _load_candidates(repo: Repository, now: datetime) -> Tuple[Dict[str, List[Dict]], Dict[str, Set[Hashable]]]:
+    """未マッチかつ±2時間以内の日記を感情ごとに分類し、キーワードと共に返す
+
+    ページ単位で読むのは1回の応答の大きさを抑えるためで、メモリの上限ではない。
+    グルーピングには感情グループ全体が必要なため、時間窓内の候補とキーワードは
+    すべて保持する（テーブル全体ではなく、時間窓内の件数に比例する）。
+    """
+    emotion_groups: Dict[str, List[Dict]] = {}
+    async for page in repo.iter_unmatched_diaries(now - MATCH_WINDOW, now + MATCH_WINDOW):
+        for diary in page:
+            emotion_groups.setdefault(diary["emotion"], []).append(diary)
+
+    # 候補全員のキーワードを数回の in_() クエリでまとめて読み込む
+    keywords = await repo.load_keywords(d["id"] for group in emotion_groups.values() for d in group)
+    return emotion_groups, keywords
+
+
+def merge_rooms(shard_rooms: Iterable[List[List[Dict]]]) -> List[List[Dict]]:
+    """各シャードのルーム案をまとめる
+
+    シャードは感情ごとに分かれ、各シャード内でも1つの日記は1つのルームにしか
+    入らないため、重複は起きない。重複があればグルーピングの不具合として扱う。
+    """
+    taken: Set[str] = set()
+    merged = []
+    for rooms in shard_rooms:
+        for members in rooms:
+            ids = {m["id"] for m in members}
+            if len(ids) < len(members) or ids & taken:
+                raise ValueError(f"Diaries assigned to more than one room: {sorted(ids & taken)}")
+            taken |= ids
+            merged.append(members)
+    return merged
+
+
+async def run_sweep(
+    repo: Repository,
+    backend: ScoringBackend = ScoringBackend.PYTHON,
+    mode: GroupingMode = GroupingMode.ANCHOR,
+    executor: Optional[Executor] = None,
+    now: Optional[datetime] = None,
+) -> Dict:
+    """未マッチ日記をまとめてマッチングし、チャットルームを作成する
+
+    repo はローカルDB（LocalMatchRepository）か Supabase（MatchRepository）。
+    データの読み書きは非同期に、感情グループごとの類似度計算は
+    プロセスプールで実行し、イベントループを止めない。
+    """
+    loop = asyncio.get_running_loop()
+    now = now or datetime.utcnow()
+    executor = executor or get_executor()
+
+    emotion_groups, keywords = await _load_candidates(repo, now)
+    vectors = {}
+    if backend == ScoringBackend.EMBEDDING:
+        vectors = await repo.load_vectors([d["id"] for group in emotion_groups.values() for d in group])
+
+    # 感情グループは互いに独立なので、シャードとして並列に処理する
+    shard_results = await asyncio.gather(*[
+        loop.run_in_executor(
+            executor,
+            plan_rooms,
+            group,
+            {d["id"]: keywords[d["id"]] for d in group},
+            SIMILARITY_THRESHOLD,
+            MAX_ROOM_SIZE,
+            backend,
+            mode,
+            {d["id"]: vectors[d["id"]] for d in group} if vectors else None,
+        )
+        for group in emotion_groups.values()
+    ])
+    shard_rooms = [rooms for rooms, _ in shard_results]
+    pairs_scored = sum(pairs for _, pairs in shard_results)
+
+    matched_rooms = []
+    new_rooms = []
+    matched_ids = []
+    expires_at = now + ROOM_LIFETIME
+
+    for members in merge_rooms(shard_rooms):
+        # 作成するチャットルームとmatchedフラグを集める
+        participants = [m["userid"] for m in members]
+        common_words = list(keywords[members[0]["id"]])
+
+        new_rooms.append({
+            "participants": participants,
+            "empathy_words": common_words,
+            "expires_at": expires_at
+        })
+        matched_ids.extend(m["id"] for m in members)
+        matched_rooms.append(participants)
+
+    # ルーム作成とフラグ更新を実行全体でまとめて反映
+    await repo.commit_rooms(new_rooms, matched_ids)
+
+    candidates = sum(len(group) for group in emotion_groups.values())
+    match_rate = len(set(matched_ids)) / candidates if candidates else 0.0
+
+    logger.info(
+        f"Match sweep ({mode.value}): {candidates} diaries, match rate {match_rate:.1%}, "
+        f"{pairs_scored} pairs scored, {len(matched_rooms)} rooms, {repo.round_trips} round trips"
+    )
+    return {
+        "matched_groups": matched_rooms,
+        "round_trips": repo.round_trips,
+        "pairs_scored": pairs_scored,
+        "match_rate": match_rate,
+    }
@@ -0,0 +1,337 @@
+from datetime import timedelta
+from enum import Enum
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from app.services import embedding, jaccard_sparse
+
+# マッチング条件
+SIMILARITY_THRESHOLD = 0.7
+MAX_ROOM_SIZE = 5
+MATCH_WINDOW = timedelta(hours=2)  # 投稿時刻の幅（±）
+EMBEDDING_THRESHOLD = 0.85  # 文書ベクトルのコサイン類似度の閾値
+
+
+class ScoringBackend(str, Enum):
+    PYTHON = "python"  # 集合演算による参照実装
+    SPARSE = "sparse"  # NumPy / SciPy の疎行列積
+    EMBEDDING = "embedding"  # spaCy 文書ベクトルのコサイン類似度
+
+
+class GroupingMode(str, Enum):
+    ANCHOR = "anchor"  # 先頭から順にアンカーを取る貪欲法
+    GRAPH = "graph"  # 類似度グラフを重みの大きい辺から結合
+
+
+def jaccard(kw1: Set, kw2: Set) -> float:
+    """キーワード集合のJaccard類似度"""
+    intersection = len(kw1 & kw2)
+    union = len(kw1 | kw2)
+    return intersection / union if union != 0 else 0
+
+
+def can_reach_threshold(size1: int, size2: int, threshold: float = SIMILARITY_THRESHOLD) -> bool:
+    """集合サイズだけで閾値に届き得るかを判定（Jaccard ≤ min/max）"""
+    larger = max(size1, size2)
+    if larger == 0:
+        return False
+    # jaccard() と同じ除算で比較し、境界値の丸め誤差で結果が変わらないようにする
+    return min(size1, size2) / larger >= threshold
+
+
+class KeywordIndex:
+    """キーワード → 日記ID の転置インデックス
+
+    キーワードは原形の文字列でも語彙IDでもよい（ハッシュできれば同じように扱う）。
+    """
+
+    def __init__(self):
+        self.postings: Dict[Hashable, Set[Hashable]] = {}
+        self.keywords: Dict[Hashable, Set[Hashable]] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict]) -> "KeywordIndex":
+        """parsed_keyword の行（diaryid, word）からインデックスを構築"""
+        index = cls()
+        for row in rows:
+            index.add(row["diaryid"], [row["word"]])
+        return index
+
+    def add(self, diary_id: Hashable, words: Iterable[Hashable]):
+        """日記のキーワードを登録"""
+        keywords = self.keywords.setdefault(diary_id, set())
+        for word in words:
+            keywords.add(word)
+            self.postings.setdefault(word, set()).add(diary_id)
+
+    def remove(self, diary_id: Hashable):
+        """日記をインデックスから削除"""
+        for word in self.keywords.pop(diary_id, ()):
+            posting = self.postings.get(word)
+            if posting is None:
+                continue
+            posting.discard(diary_id)
+            if not posting:
+                del self.postings[word]
+
+    def get(self, diary_id: Hashable) -> Set[Hashable]:
+        """日記のキーワード集合を取得"""
+        return self.keywords.get(diary_id, set())
+
+    def candidates(self, diary_id: Hashable, threshold: float = SIMILARITY_THRESHOLD) -> Set[Hashable]:
+        """1語以上を共有し、サイズ上閾値に届き得る日記IDを返す"""
+        result = self.candidates_for(self.get(diary_id), threshold)
+        result.discard(diary_id)
+        return result
+
+    def candidates_for(self, keywords: Set[Hashable], threshold: float = SIMILARITY_THRESHOLD) -> Set[Hashable]:
+        """キーワード集合に対する候補の日記IDを返す（未登録の日記用）"""
+        shared: Set[Hashable] = set()
+        for word in keywords:
+            shared |= self.postings.get(word, set())
+
+        size = len(keywords)
+        return {
+            other for other in shared
+            if can_reach_threshold(size, len(self.keywords[other]), threshold)
+        }
+
+
+def group_by_anchor(
+    group: List[Dict],
+    index: KeywordIndex,
+    threshold: float = SIMILARITY_THRESHOLD,
+    max_size: int = MAX_ROOM_SIZE,
+    backend: ScoringBackend = ScoringBackend.PYTHON,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[Tuple[List[Dict], Set[Hashable]]]:
+    """先頭から順にアンカーを取り、類似する後続の日記をまとめる
+
+    ルームに入った日記は以降のアンカー・メンバーにしない。結果は、入力順に
+    未割り当ての後続の日記を先着順に加える貪欲法（tests/test_matcher.py の
+    参照実装）と一致する。転置インデックスの候補と、長さから閾値に届かない組を
+    除いた残りだけをスコアリングする。戻り値は (メンバー, アンカーのキーワード) のリスト。
+    stats を渡すと、類似度を計算したペア数を "pairs_scored" に加算する。
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("pairs_scored", 0)
+
+    if backend == ScoringBackend.EMBEDDING:
+        raise ValueError("The embedding backend needs document vectors; use plan_rooms")
+    if backend == ScoringBackend.SPARSE:
+        return _group_by_anchor_sparse(group, index, threshold, max_size, stats)
+
+    position = {diary["id"]: i for i, diary in enumerate(group)}
+    assigned: Set[int] = set()
+    rooms = []
+
+    for i, user1 in enumerate(group):
+        # すでにルームに入った日記はアンカーにもメンバーにもしない
+        if i in assigned:
+            continue
+        kw1 = index.get(user1["id"])
+
+        # 共通語を持つ未割り当ての後続の日記だけを、元の並び順で評価する
+        partners = sorted(
+            j for j in (position.get(other, -1) for other in index.candidates(user1["id"], threshold))
+            if j > i and j not in assigned
+        )
+
+        matches = [i]
+        for j in partners:
+            stats["pairs_scored"] += 1
+            if jaccard(kw1, index.get(group[j]["id"])) >= threshold:
+                matches.append(j)
+
+            if len(matches) >= max_size:
+                break
+
+        if len(matches) >= 2:
+            assigned.update(matches)
+            rooms.append(([group[j] for j in matches], kw1))
+
+    return rooms
+
+
+def _group_by_anchor_sparse(
+    group: List[Dict],
+    index: KeywordIndex,
+    threshold: float,
+    max_size: int,
+    stats: Dict[str, int],
+) -> List[Tuple[List[Dict], Set[Hashable]]]:
+    """group_by_anchor の疎行列版（類似ペアをブロック単位でまとめて計算）"""
+    adjacency = jaccard_sparse.similar_pairs([index.get(d["id"]) for d in group], threshold, stats=stats)
+    return _rooms_from_adjacency(group, index, adjacency, max_size)
+
+
+def _rooms_from_adjacency(
+    group: List[Dict],
+    index: KeywordIndex,
+    adjacency: List[List[int]],
+    max_size: int,
+) -> List[Tuple[List[Dict], Set[Hashable]]]:
+    """各アンカーの類似する後続リストから、アンカー順の貪欲法でルームを作る
+
+    group_by_anchor と同じく、ルームに入った日記は以降のアンカー・メンバーから外す。
+    """
+    assigned: Set[int] = set()
+    rooms = []
+    for i, user1 in enumerate(group):
+        if i in assigned:
+            continue
+        partners = [j for j in adjacency[i] if j not in assigned][:max_size - 1]
+        if partners:
+            assigned.add(i)
+            assigned.update(partners)
+            rooms.append(([user1] + [group[j] for j in partners], index.get(user1["id"])))
+    return rooms
+
+
+class _UnionFind:
+    """サイズ付きのUnion-Find"""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+
+def similarity_edges(
+    group: List[Dict],
+    index: KeywordIndex,
+    threshold: float = SIMILARITY_THRESHOLD,
+    backend: ScoringBackend = ScoringBackend.PYTHON,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[Tuple[float, int, int]]:
+    """類似度が閾値以上の日記ペアを (類似度, i, j) の辺として返す（i < j は group 内の位置）"""
+    if stats is None:
+        stats = {}
+    stats.setdefault("pairs_scored", 0)
+
+    if backend == ScoringBackend.EMBEDDING:
+        raise ValueError("The embedding backend needs document vectors; use plan_rooms")
+    if backend == ScoringBackend.SPARSE:
+        return jaccard_sparse.similar_edges([index.get(d["id"]) for d in group], threshold, stats=stats)
+
+    position = {diary["id"]: i for i, diary in enumerate(group)}
+    edges = []
+    for i, diary in enumerate(group):
+        keywords = index.get(diary["id"])
+        for other in index.candidates(diary["id"], threshold):
+            j = position.get(other, -1)
+            if j <= i:
+                continue
+            stats["pairs_scored"] += 1
+            similarity = jaccard(keywords, index.get(other))
+            if similarity >= threshold:
+                edges.append((similarity, i, j))
+    return edges
+
+
+def cluster_by_graph(
+    group: List[Dict],
+    index: KeywordIndex,
+    threshold: float = SIMILARITY_THRESHOLD,
+    max_size: int = MAX_ROOM_SIZE,
+    backend: ScoringBackend = ScoringBackend.PYTHON,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[Tuple[List[Dict], Set[Hashable]]]:
+    """類似度グラフを一度だけ作り、2〜max_size 人のルームに分割する
+
+    辺を類似度の大きい順に見て、結合後の大きさが max_size 以下なら
+    Union-Find で2つのまとまりを結合する（サイズ制約付きの貪欲な最大重み結合）。
+    計算量は辺の数 E に対して O(E log E)。入力順には依存しない。
+    """
+    edges = similarity_edges(group, index, threshold, backend, stats)
+    return _rooms_from_edges(group, index, edges, max_size)
+
+
+def _rooms_from_edges(
+    group: List[Dict],
+    index: KeywordIndex,
+    edges: List[Tuple[float, int, int]],
+    max_size: int,
+) -> List[Tuple[List[Dict], Set[Hashable]]]:
+    """類似度の辺をサイズ制約付きで結合してルームを作る"""
+    # 同じ類似度の辺は両端の日記IDの組で順序を決め、入力順の影響をなくす
+    def edge_key(edge: Tuple[float, int, int]):
+        a, b = group[edge[1]]["id"], group[edge[2]]["id"]
+        return -edge[0], min(a, b), max(a, b)
+
+    edges = sorted(edges, key=edge_key)
+
+    components = _UnionFind(len(group))
+    for _, i, j in edges:
+        a, b = components.find(i), components.find(j)
+        if a != b and components.size[a] + components.size[b] <= max_size:
+            components.union(a, b)
+
+    members: Dict[int, List[Dict]] = {}
+    for i, diary in enumerate(group):
+        members.setdefault(components.find(i), []).append(diary)
+
+    # ルームとメンバーも日記IDの順に並べ、入力順によらず同じ結果にする
+    rooms = sorted(
+        (sorted(matches, key=lambda diary: diary["id"]) for matches in members.values() if len(matches) >= 2),
+        key=lambda matches: matches[0]["id"]
+    )
+    return [(matches, index.get(matches[0]["id"])) for matches in rooms]
+
+
+def _group_by_embedding(
+    group: List[Dict],
+    index: KeywordIndex,
+    vectors: Dict[Hashable, object],
+    max_size: int,
+    mode: GroupingMode,
+    stats: Dict[str, int],
+) -> List[Tuple[List[Dict], Set[Hashable]]]:
+    """文書ベクトルのコサイン類似度でルームを作る"""
+    edges = embedding.similar_edges([vectors.get(d["id"]) for d in group], EMBEDDING_THRESHOLD, stats=stats)
+    if mode == GroupingMode.GRAPH:
+        return _rooms_from_edges(group, index, edges, max_size)
+
+    adjacency: List[List[int]] = [[] for _ in group]
+    for _, i, j in sorted(edges, key=lambda edge: (edge[1], edge[2])):
+        adjacency[i].append(j)
+    return _rooms_from_adjacency(group, index, adjacency, max_size)
+
+
+def plan_rooms(
+    group: List[Dict],
+    keywords: Dict[Hashable, Set[Hashable]],
+    threshold: float = SIMILARITY_THRESHOLD,
+    max_size: int = MAX_ROOM_SIZE,
+    backend: ScoringBackend = ScoringBackend.PYTHON,
+    mode: GroupingMode = GroupingMode.ANCHOR,
+    vectors: Optional[Dict[Hashable, object]] = None,
+) -> Tuple[List[List[Dict]], int]:
+    """1つの感情グループのルーム案を作る（プロセスプールのワーカーで実行される）
+
+    backend が EMBEDDING の場合は vectors（日記ID → 正規化済みベクトル）を使う。
+    戻り値は (ルームごとのメンバー, 類似度を計算したペア数)。
+    """
+    index = KeywordIndex()
+    for diary in group:
+        index.add(diary["id"], keywords.get(diary["id"], set()))
+
+    stats: Dict[str, int] = {"pairs_scored": 0}
+    if backend == ScoringBackend.EMBEDDING:
+        rooms = _group_by_embedding(group, index, vectors or {}, max_size, mode, stats)
+    elif mode == GroupingMode.GRAPH:
+        rooms = cluster_by_graph(group, index, threshold, max_size, backend, stats)
+    else:
+        rooms = group_by_anchor(group, index, threshold, max_size, backend, stats)
+    return [matches for matches, _ in rooms], stats["pairs_scored"]
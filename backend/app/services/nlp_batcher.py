@@ -0,0 +1,86 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.services.nlp_pool import nlp_pool
+
+logger = logging.getLogger(__name__)
+
+AnalysisResult = Tuple[List[Dict], Optional[bytes]]
+
+
+class KeywordBatcher:
+    """キーワード抽出のマイクロバッチ処理
+
+    到着したテキストを最大 max_size 件、または最初の1件から max_wait_ms
+    経過するまで溜め、まとめて nlp.pipe に流す。結果は呼び出し元ごとの
+    Future に返すため、1件あたりの待ち時間は max_wait_ms + 解析時間に収まる。
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[str]], Awaitable[List[AnalysisResult]]],
+        max_size: int = settings.NLP_BATCH_MAX_SIZE,
+        max_wait_ms: int = settings.NLP_BATCH_MAX_WAIT_MS,
+    ):
+        self.process_batch = process_batch
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def analyze(self, text: str) -> AnalysisResult:
+        """テキストをバッチに追加し、解析結果を待つ"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    async def drain(self):
+        """溜まっているテキストを解析し、実行中のバッチの完了を待つ"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            results = await self.process_batch([text for text, _ in batch])
+        except Exception as e:
+            logger.error(f"Keyword batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            # 解析に失敗したテキストは、その呼び出し元だけに例外を返す
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+keyword_batcher = KeywordBatcher(nlp_pool.analyze_batch)
@@ -0,0 +1,368 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import time
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import get_encryption_service
+from app.db.models import Diary, NLPJob
+from app.db.session import SessionLocal
+from app.services.incremental_matcher import incremental_matcher
+from app.services.keyword_store import keyword_id_set, pack_keywords, replace_parsed_keywords
+from app.services.nlp_batcher import keyword_batcher
+
+logger = logging.getLogger(__name__)
+
+# ジョブの状態
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class NLPJobWorker:
+    """nlp_jobs テーブルに積まれた日記のNLP処理を行う常駐ワーカー
+
+    ジョブはDBに保存されるため、再起動しても失われない。期限の来たジョブを
+    空きスロットの数だけ取り出して並行処理し（同時実行数は concurrency まで）、
+    失敗したジョブは指数バックオフで再試行する。DB操作は毎回新しいセッションで行い、
+    リクエストのセッションには依存しない。
+
+    取り出したジョブには lease 秒の期限（locked_until）を付け、処理中は lease / 3 ごとに
+    延長する。期限が切れたジョブ（処理中のプロセスが落ちたもの）だけをキューに戻すため、
+    複数のプロセスが同じテーブルを処理していても、他のプロセスのジョブは奪わない。
+    """
+
+    def __init__(
+        self,
+        concurrency: int = settings.NLP_JOB_CONCURRENCY,
+        max_attempts: int = settings.NLP_JOB_MAX_ATTEMPTS,
+        poll_interval: float = settings.NLP_JOB_POLL_INTERVAL_S,
+        backoff: float = settings.NLP_JOB_BACKOFF_S,
+        backoff_max: float = settings.NLP_JOB_BACKOFF_MAX_S,
+        lease: float = settings.NLP_JOB_LEASE_S,
+    ):
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # 処理中のタスクとジョブID
+        self._active: Dict[asyncio.Task, int] = {}
+
+    async def start(self):
+        """期限切れのジョブを回収し、ジョブの処理ループを開始"""
+        if self._task is not None:
+            return
+        await self._recover()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"NLP job worker started (concurrency={self.concurrency})")
+
+    async def stop(self):
+        """処理ループを止め、実行中のジョブの完了を待つ"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._active:
+            await asyncio.gather(*self._active.keys(), return_exceptions=True)
+        self._wakeup = None
+        logger.info("NLP job worker stopped")
+
+    def notify(self):
+        """ジョブが登録されたことを知らせ、ポーリング間隔を待たずに処理させる"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def metrics(self) -> Dict:
+        """キューの深さ・遅延と処理件数"""
+        stats = await asyncio.to_thread(self._queue_stats)
+        stats.update({
+            "in_flight": len(self._active),
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed_total": self.failed,
+        })
+        return stats
+
+    async def _run(self):
+        next_heartbeat = time.monotonic() + self.lease / 3
+        while True:
+            # 待機中に届いた通知を取りこぼさないよう、取り出す前にクリアする
+            self._wakeup.clear()
+            if time.monotonic() >= next_heartbeat:
+                next_heartbeat = time.monotonic() + self.lease / 3
+                await self._heartbeat()
+            slots = self.concurrency - len(self._active)
+            if slots > 0:
+                try:
+                    jobs = await asyncio.to_thread(self._claim, slots)
+                except Exception as e:
+                    logger.error(f"Failed to claim NLP jobs: {e}")
+                    jobs = []
+                for job_id, diary_id, attempt in jobs:
+                    task = asyncio.create_task(self._process(job_id, diary_id, attempt))
+                    self._active[task] = job_id
+                    task.add_done_callback(self._on_done)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat(self):
+        """処理中のジョブの期限を延長し、他のプロセスで期限切れになったジョブを回収する"""
+        try:
+            if self._active:
+                await asyncio.to_thread(self._extend_leases, list(self._active.values()))
+        except Exception as e:
+            logger.error(f"Failed to extend NLP job leases: {e}")
+        await self._recover()
+
+    async def _recover(self):
+        try:
+            requeued, failed = await asyncio.to_thread(self._requeue_expired)
+        except Exception as e:
+            logger.error(f"Failed to requeue expired NLP jobs: {e}")
+            return
+        if requeued or failed:
+            self.failed += failed
+            logger.warning(f"Requeued {requeued} NLP jobs whose lease expired ({failed} gave up)")
+
+    def _on_done(self, task: asyncio.Task):
+        self._active.pop(task, None)
+        # スロットが空いたので次のジョブを取り出させる
+        self.notify()
+
+    async def _process(self, job_id: int, diary_id: str, attempt: int):
+        try:
+            content = await asyncio.to_thread(self._load_content, diary_id)
+            if content is None:
+                # 日記が削除済みなら処理するものはない
+                await asyncio.to_thread(self._save, job_id, diary_id, None, None)
+                return
+
+            keywords, embedding = await keyword_batcher.analyze(content)
+            diary = await asyncio.to_thread(self._save, job_id, diary_id, keywords, embedding)
+        except Exception as e:
+            await self._retry(job_id, diary_id, attempt, e)
+            return
+
+        self.processed += 1
+
+        # 逐次マッチャーに渡し、到着した時点でマッチングを試みる（語彙IDの集合で比較する）
+        if diary and diary[0]:
+            await incremental_matcher.submit(diary_id, diary[0], diary[1], diary[2])
+
+    async def _retry(self, job_id: int, diary_id: str, attempt: int, error: Exception):
+        give_up = attempt >= self.max_attempts
+        delay = min(self.backoff * 2 ** (attempt - 1), self.backoff_max)
+        try:
+            await asyncio.to_thread(self._reschedule, job_id, give_up, delay, str(error))
+        except Exception as e:
+            # 実行中のまま残ったジョブは期限が切れるとキューに戻る
+            logger.error(f"Failed to reschedule NLP job {job_id}: {e}")
+            return
+
+        if give_up:
+            self.failed += 1
+            logger.error(f"NLP job {job_id} for diary {diary_id} failed after {attempt} attempts: {error}")
+        else:
+            self.retried += 1
+            logger.warning(f"NLP job {job_id} for diary {diary_id} failed (attempt {attempt}), retrying in {delay:.1f}s: {error}")
+
+    # --- 以下はスレッドで実行するDB操作 ---
+
+    def _requeue_expired(self) -> Tuple[int, int]:
+        """期限の切れた実行中のジョブをキューに戻す（試行回数を使い切ったものは失敗にする）
+
+        locked_until のない行（期限を導入する前に取り出されたジョブ）は updated_at で判断する。
+        戻り値は (キューに戻した件数, 失敗にした件数)。
+        """
+        now = datetime.utcnow()
+        expired = and_(
+            NLPJob.status == RUNNING,
+            or_(
+                NLPJob.locked_until < now,
+                and_(NLPJob.locked_until.is_(None), NLPJob.updated_at < now - timedelta(seconds=self.lease)),
+            ),
+        )
+        db = SessionLocal()
+        try:
+            failed = (
+                db.query(NLPJob)
+                .filter(expired, NLPJob.attempts >= self.max_attempts)
+                .update(
+                    {NLPJob.status: FAILED, NLPJob.locked_until: None, NLPJob.last_error: "lease expired"},
+                    synchronize_session=False
+                )
+            )
+            requeued = (
+                db.query(NLPJob)
+                .filter(expired)
+                .update(
+                    {NLPJob.status: PENDING, NLPJob.next_run_at: now, NLPJob.locked_until: None},
+                    synchronize_session=False
+                )
+            )
+            db.commit()
+            return requeued, failed
+        finally:
+            db.close()
+
+    def _extend_leases(self, job_ids: List[int]):
+        db = SessionLocal()
+        try:
+            db.query(NLPJob).filter(NLPJob.id.in_(job_ids), NLPJob.status == RUNNING).update(
+                {NLPJob.locked_until: datetime.utcnow() + timedelta(seconds=self.lease)},
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _claim(self, limit: int) -> List[Tuple[int, str, int]]:
+        """期限の来たジョブを最大 limit 件取り出して実行中にする
+
+        Postgres では SKIP LOCKED で他のプロセスが選んだ行を飛ばす。行ロックのない
+        SQLite でも二重に取り出さないよう、各ジョブは読んだ時点の状態を条件にした
+        UPDATE で取り出し、更新できた（rowcount が 1 の）ジョブだけを処理する。
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            candidates = (
+                db.query(NLPJob.id, NLPJob.diary_id, NLPJob.attempts)
+                .filter(NLPJob.status == PENDING, NLPJob.next_run_at <= now)
+                .order_by(NLPJob.next_run_at, NLPJob.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            claimed = []
+            locked_until = now + timedelta(seconds=self.lease)
+            for job_id, diary_id, attempts in candidates:
+                if self._try_claim(db, job_id, attempts, locked_until, now):
+                    claimed.append((job_id, diary_id, attempts + 1))
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _try_claim(self, db: Session, job_id: int, attempts: int, locked_until: datetime, now: datetime) -> bool:
+        """読んだ時点から変わっていないジョブだけを実行中にする（他のプロセスが先に取り出していれば False）"""
+        updated = (
+            db.query(NLPJob)
+            .filter(
+                NLPJob.id == job_id,
+                NLPJob.status == PENDING,
+                NLPJob.attempts == attempts,
+                or_(NLPJob.locked_until.is_(None), NLPJob.locked_until < now),
+            )
+            .update(
+                {NLPJob.status: RUNNING, NLPJob.attempts: attempts + 1, NLPJob.locked_until: locked_until},
+                synchronize_session=False
+            )
+        )
+        return updated == 1
+
+    def _load_content(self, diary_id: str) -> Optional[str]:
+        """日記の本文を復号化して返す"""
+        db = SessionLocal()
+        try:
+            diary = db.query(Diary).filter(Diary.id == diary_id).first()
+            if diary is None:
+                return None
+            return get_encryption_service().decrypt_text(diary.content)
+        finally:
+            db.close()
+
+    def _save(
+        self,
+        job_id: int,
+        diary_id: str,
+        keywords: Optional[List[Dict]],
+        embedding: Optional[bytes],
+    ) -> Optional[Tuple[Optional[str], datetime, Set[int]]]:
+        """抽出結果（packed 配列と parsed_keywords の行）を保存し、ジョブを完了にする（同じトランザクション）
+
+        戻り値は日記の (感情タグ, 投稿時刻, 語彙IDの集合)。日記がなければ None。
+        """
+        db = SessionLocal()
+        try:
+            result = None
+            diary = db.query(Diary).filter(Diary.id == diary_id).first()
+            if diary is not None and keywords is not None:
+                diary.keyword_ids = pack_keywords(keywords)
+                diary.keywords = None
+                diary.embedding = embedding
+                replace_parsed_keywords(db, [(diary_id, diary.created_at, keywords)])
+                result = (diary.emotion_tag, diary.created_at, keyword_id_set(diary.keyword_ids))
+
+            db.query(NLPJob).filter(NLPJob.id == job_id).update(
+                {NLPJob.status: DONE, NLPJob.last_error: None, NLPJob.locked_until: None},
+                synchronize_session=False
+            )
+            db.commit()
+            return result
+        finally:
+            db.close()
+
+    def _reschedule(self, job_id: int, give_up: bool, delay: float, error: str):
+        db = SessionLocal()
+        try:
+            db.query(NLPJob).filter(NLPJob.id == job_id).update(
+                {
+                    NLPJob.status: FAILED if give_up else PENDING,
+                    NLPJob.next_run_at: datetime.utcnow() + timedelta(seconds=delay),
+                    NLPJob.last_error: error[:1000],
+                    NLPJob.locked_until: None,
+                },
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _queue_stats(self) -> Dict:
+        db = SessionLocal()
+        try:
+            counts = dict(
+                db.query(NLPJob.status, func.count(NLPJob.id))
+                .filter(NLPJob.status.in_([PENDING, RUNNING, FAILED]))
+                .group_by(NLPJob.status)
+                .all()
+            )
+            oldest = (
+                db.query(func.min(NLPJob.created_at))
+                .filter(NLPJob.status.in_([PENDING, RUNNING]))
+                .scalar()
+            )
+        finally:
+            db.close()
+
+        return {
+            "depth": counts.get(PENDING, 0),
+            "running": counts.get(RUNNING, 0),
+            "failed": counts.get(FAILED, 0),
+            # 未完了で最も古いジョブが登録されてからの経過秒数
+            "lag_seconds": (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0,
+        }
+
+
+nlp_job_worker = NLPJobWorker()
@@ -0,0 +1,145 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import multiprocessing
+import time
+
+from app.core.config import settings
+from app.services.nlp_service import get_nlp_service
+
+logger = logging.getLogger(__name__)
+
+# --- ワーカープロセス側 ---
+
+_worker_service = None
+
+
+def _init_worker():
+    """ワーカー起動時に一度だけ spaCy モデルと Sudachi 辞書を読み込み、推論を1回済ませる"""
+    global _worker_service
+    _worker_service = get_nlp_service()
+    _worker_service.warm_up()
+
+
+def _warm_up() -> int:
+    """ワーカーの起動と初期化を待つためのタスク"""
+    return multiprocessing.current_process().pid
+
+
+def _extract_keywords(text: str) -> List[Dict]:
+    return _worker_service.extract_keywords(text)
+
+
+def _analyze(text: str) -> Tuple[List[Dict], Optional[bytes]]:
+    return _worker_service.analyze(text)
+
+
+def _analyze_batch(texts: List[str]) -> List[Tuple[List[Dict], Optional[bytes]]]:
+    return _worker_service.analyze_batch(texts, batch_size=len(texts), return_exceptions=True)
+
+
+# --- アプリケーション側 ---
+
+class TextSlots:
+    """プロセスプールに投入中のテキスト件数の上限
+
+    バッチは含むテキストの件数分の枠を一度に確保する（1件ずつ確保すると、
+    複数のバッチが枠を分け合ったまま待ち続けることがある）。
+    上限より大きいバッチは、枠をすべて確保して単独で流す。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def hold(self, count: int):
+        count = min(count, self.limit)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_use + count <= self.limit)
+            self.in_use += count
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_use -= count
+                self._condition.notify_all()
+
+
+class NLPWorkerPool:
+    """モデルを読み込み済みのワーカーを常駐させるプロセスプール
+
+    spaCy の解析はGILを保持するため、プロセスに分けて複数コアで処理する。
+    同時に投入できるテキストの件数（バッチはその件数分）を制限し、
+    超えた呼び出しは空きが出るまで待たせる。
+    """
+
+    def __init__(self, workers: int = settings.NLP_WORKERS, max_pending: int = settings.NLP_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[TextSlots] = None
+
+    @property
+    def running(self) -> bool:
+        return self.executor is not None
+
+    async def start(self):
+        """ワーカーを起動し、全ワーカーのモデル読み込みが終わるまで待つ"""
+        if self.running or self.workers <= 0:
+            return
+        started = time.perf_counter()
+        # イベントループのスレッドを引き継がないよう spawn で起動する
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        self._slots = TextSlots(self.max_pending)
+
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, _warm_up) for _ in range(self.workers)
+        ])
+        logger.info(
+            f"NLP worker pool ready: {len(set(pids))} workers in {time.perf_counter() - started:.1f}s"
+        )
+
+    async def stop(self):
+        """ワーカーを停止"""
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        self._slots = None
+
+    async def _submit(self, fn: Callable, payload, texts: int = 1):
+        loop = asyncio.get_running_loop()
+        async with self._slots.hold(texts):
+            return await loop.run_in_executor(self.executor, fn, payload)
+
+    async def extract_keywords(self, text: str) -> List[Dict]:
+        """キーワードを抽出（プール未起動時はメインプロセスで処理）"""
+        if not self.running:
+            return await get_nlp_service().extract_keywords_async(text)
+        return await self._submit(_extract_keywords, text)
+
+    async def analyze(self, text: str) -> Tuple[List[Dict], Optional[bytes]]:
+        """キーワードと文書ベクトルを抽出（プール未起動時はメインプロセスで処理）"""
+        if not self.running:
+            return await get_nlp_service().analyze_async(text)
+        return await self._submit(_analyze, text)
+
+    async def analyze_batch(self, texts: List[str]) -> List[Tuple[List[Dict], Optional[bytes]]]:
+        """複数のテキストを1タスクとしてまとめて解析（失敗したテキストの位置には例外が入る）"""
+        if not self.running:
+            loop = asyncio.get_running_loop()
+            service = get_nlp_service()
+            return await loop.run_in_executor(service.executor, service.analyze_batch, texts, len(texts), True)
+        return await self._submit(_analyze_batch, texts, len(texts))
+
+
+nlp_pool = NLPWorkerPool()
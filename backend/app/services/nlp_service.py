@@ -1,23 +1,61 @@
-import spacy
-from typing import List, Dict
+from collections import Counter
+from importlib import metadata
+from typing import List, Dict, Optional, Tuple
+import heapq
 from app.core.config import settings
 import logging
 import asyncio
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
+import sudachipy
 from sudachipy import tokenizer
 from sudachipy import dictionary
+from app.services.embedding import encode_vector
+from app.services.keyword_cache import KeywordCache
+from app.services.sudachi_engine import SudachiAnalyzer
 
 logger = logging.getLogger(__name__)
 
+# 選択できる抽出エンジン
+ENGINES = ("spacy", "spacy_lite", "sudachi")
+
+# 品詞による重み付け（この品詞だけをキーワード候補とする）
+POS_WEIGHTS = {
+    'NOUN': 1.0,
+    'ADJ': 0.8,
+    'VERB': 0.6
+}
+
+# 返すキーワードの最大数
+MAX_KEYWORDS = 10
+
+# キーワードの選び方・重要度の計算のバージョン。キャッシュのキーに含めるため、
+# _calculate_importance_score・POS_WEIGHTS・ストップワードなどを変えたら上げる
+SCORING_VERSION = 2
+
+# 起動時のウォームアップで解析する文章
+WARM_UP_TEXT = "今日は仕事で疲れたけれど、友達と話して少し元気が出た。"
+
+def load_spacy_model(exclude: Optional[List[str]] = None):
+    """spaCyモデルを読み込む（未インストールならダウンロード）"""
+    import spacy
+    
+    exclude = exclude or []
+    try:
+        return spacy.load(settings.SPACY_MODEL, exclude=exclude)
+    except OSError:
+        logger.warning(f"spaCy model '{settings.SPACY_MODEL}' not found. Installing...")
+        import subprocess
+        subprocess.run(["python", "-m", "spacy", "download", settings.SPACY_MODEL])
+        return spacy.load(settings.SPACY_MODEL, exclude=exclude)
+
 class NLPService:
-    def __init__(self):
-        try:
-            self.nlp = spacy.load(settings.SPACY_MODEL)
-        except OSError:
-            logger.warning(f"spaCy model '{settings.SPACY_MODEL}' not found. Installing...")
-            import subprocess
-            subprocess.run(["python", "-m", "spacy", "download", settings.SPACY_MODEL])
-            self.nlp = spacy.load(settings.SPACY_MODEL)
+    def __init__(self, engine: Optional[str] = None):
+        self.engine = engine or settings.NLP_ENGINE
+        if self.engine not in ENGINES:
+            logger.warning(f"Unknown NLP engine '{self.engine}'. Falling back to spacy")
+            self.engine = "spacy"
         
         # SudachiPyの初期化
         try:
@@ -26,6 +64,21 @@ class NLPService:
             logger.warning(f"SudachiPy initialization failed: {e}")
             self.sudachi_tokenizer = None
         
+        if self.engine == "sudachi" and self.sudachi_tokenizer is None:
+            logger.warning("Sudachi engine unavailable. Falling back to spacy")
+            self.engine = "spacy"
+        
+        if self.engine == "sudachi":
+            # 形態素解析のみ（spaCyモデルは読み込まない）
+            self.nlp = SudachiAnalyzer(self.sudachi_tokenizer)
+        elif self.engine == "spacy_lite":
+            # 係り受け解析を外し、文分割は軽量な senter で行う
+            self.nlp = load_spacy_model(exclude=["parser"])
+            if "senter" in self.nlp.disabled:
+                self.nlp.enable_pipe("senter")
+        else:
+            self.nlp = load_spacy_model()
+        
         # ストップワードの定義
         self.stop_words = {
             'の', 'に', 'は', 'を', 'が', 'で', 'と', 'から', 'まで', 'より', 'や', 'か', 'も',
@@ -34,57 +87,159 @@ class NLPService:
             'に', 'へ', 'と', 'から', 'まで', 'より', 'や', 'か', 'も', 'など', 'とか',
             'ばかり', 'だけ', 'のみ', 'きり', 'ぐらい', 'ほど', 'くらい', 'ばかり'
         }
+        
+        # 同じ内容のテキストはNLPを通さず、キャッシュした結果を返す
+        self.cache = KeywordCache(
+            f"{self._engine_version()}-scoring{SCORING_VERSION}",
+            max_size=settings.KEYWORD_CACHE_SIZE,
+            disk_path=settings.KEYWORD_CACHE_PATH,
+            disk_max_size=settings.KEYWORD_CACHE_DISK_SIZE
+        )
+        
+        # 呼び出しごとに作り直さず、同じスレッドプールを使い回す
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlp")
+    
+    def _engine_version(self) -> str:
+        """キャッシュのキーに使うエンジンのバージョン（Sudachi では spaCy を読み込まない）"""
+        if self.engine == "sudachi":
+            try:
+                dictionary_version = metadata.version("sudachidict-core")
+            except metadata.PackageNotFoundError:
+                dictionary_version = ""
+            return f"sudachi-{self.nlp.meta['version']}-sudachipy{sudachipy.__version__}-dict{dictionary_version}"
+
+        import spacy
+        return f"{self.engine}-{settings.SPACY_MODEL}-{self.nlp.meta.get('version', '')}-spacy{spacy.__version__}"
     
     async def extract_keywords_async(self, text: str) -> List[Dict]:
         """非同期でキーワードを抽出"""
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as executor:
-            keywords = await loop.run_in_executor(executor, self.extract_keywords, text)
-        return keywords
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.extract_keywords, text)
+    
+    async def analyze_async(self, text: str) -> Tuple[List[Dict], Optional[bytes]]:
+        """非同期でキーワードと文書ベクトルを抽出"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.analyze, text)
+    
+    def analyze(self, text: str) -> Tuple[List[Dict], Optional[bytes]]:
+        """1回の解析でキーワードと文書ベクトル（float32）を抽出"""
+        cached = self.cache.get(text)
+        if cached is not None:
+            return cached
+        # 解析の失敗は呼び出し元（NLPジョブの再試行など）に任せる
+        doc = self.nlp(text)
+        result = (self._keywords_from_doc(doc, text), self._vector_from_doc(doc))
+        self.cache.put(text, result)
+        return result
+    
+    def analyze_batch(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        return_exceptions: bool = False,
+    ) -> List[Tuple[List[Dict], Optional[bytes]]]:
+        """複数のテキストを nlp.pipe でまとめて解析（キャッシュにないものだけ解析）
+
+        return_exceptions が真なら、解析に失敗したテキストの位置には例外を入れて返す
+        （asyncio.gather と同じ）。偽なら最初の例外を送出する。
+        """
+        results = [self.cache.get(text) for text in texts]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+        
+        try:
+            docs = self.nlp.pipe([texts[i] for i in misses], batch_size=batch_size)
+            for i, doc in zip(misses, docs):
+                results[i] = (self._keywords_from_doc(doc, texts[i]), self._vector_from_doc(doc))
+                self.cache.put(texts[i], results[i])
+            return results
+        except Exception as e:
+            logger.error(f"Batch analysis error: {e}")
+            # バッチ内の1件の失敗で全体を失わないよう、1件ずつ解析し直す
+            for i in misses:
+                try:
+                    results[i] = self.analyze(texts[i])
+                except Exception as error:
+                    if not return_exceptions:
+                        raise
+                    results[i] = error
+            return results
+    
+    def warm_up(self) -> float:
+        """サンプルの文章を1回解析し、初回推論の遅延を起動時に済ませる（キャッシュは使わない）"""
+        started = time.perf_counter()
+        doc = self.nlp(WARM_UP_TEXT)
+        self._keywords_from_doc(doc, WARM_UP_TEXT)
+        self._vector_from_doc(doc)
+        return time.perf_counter() - started
     
     def extract_keywords(self, text: str) -> List[Dict]:
         """テキストから共感ワードを抽出"""
+        keywords, _ = self.analyze(text)
+        return keywords
+    
+    def _vector_from_doc(self, doc) -> Optional[bytes]:
+        """文書ベクトルを正規化したfloat32のバイト列に変換"""
+        if doc.vector is None:
+            return None
         try:
-            doc = self.nlp(text)
-            keywords = []
-            
-            for token in doc:
-                # 品詞フィルタリング
-                if token.pos_ in ['NOUN', 'ADJ', 'VERB'] and not token.is_stop:
-                    # ストップワードチェック
-                    if token.text not in self.stop_words and len(token.text) > 1:
-                        # 重要度スコアを計算
-                        importance_score = self._calculate_importance_score(token, doc)
-                        
-                        keywords.append({
-                            'word': token.lemma_,
-                            'original': token.text,
-                            'pos': token.pos_,
-                            'importance_score': importance_score,
-                            'frequency': self._count_frequency(token.text, text)
-                        })
-            
-            # 重要度スコアでソート
-            keywords.sort(key=lambda x: x['importance_score'], reverse=True)
+            return encode_vector(doc.vector)
+        except Exception as e:
+            logger.error(f"Document vector error: {e}")
+            return None
+    
+    def _keywords_from_doc(self, doc, text: str) -> List[Dict]:
+        """解析済みの文書から共感ワードを抽出
+
+        トークン列を1回だけ走査し、出現頻度は Counter、文の開始位置は
+        事前計算した表から求める。同じ原形は最も重要度の高いものだけ残し、
+        上位はヒープで選ぶため、トークン数に対して線形に近い計算量で済む。
+        """
+        tokens = list(doc)
+        frequencies = Counter(token.lemma_ for token in tokens)
+        sentence_starts = self._sentence_starts(doc)
+        text_length = len(doc.text) or 1
+        
+        best: Dict[str, Dict] = {}
+        for i, token in enumerate(tokens):
+            # 品詞フィルタリング
+            if token.pos_ not in POS_WEIGHTS or token.is_stop:
+                continue
+            # ストップワードチェック
+            if token.text in self.stop_words or len(token.text) <= 1:
+                continue
             
-            # 上位10個を返す
-            return keywords[:10]
+            # 重要度スコアを計算
+            importance_score = self._calculate_importance_score(token, sentence_starts[i] / text_length)
             
-        except Exception as e:
-            logger.error(f"Keyword extraction error: {e}")
-            return []
+            # 同じ原形は重要度の高いものだけ残す
+            current = best.get(token.lemma_)
+            if current is None or importance_score > current['importance_score']:
+                best[token.lemma_] = {
+                    'word': token.lemma_,
+                    'original': token.text,
+                    'pos': token.pos_,
+                    'importance_score': importance_score,
+                    'frequency': frequencies[token.lemma_]
+                }
+        
+        # 重要度スコアの上位を返す
+        return heapq.nlargest(MAX_KEYWORDS, best.values(), key=lambda x: x['importance_score'])
+    
+    def _sentence_starts(self, doc) -> List[int]:
+        """各トークンが属する文の開始位置（doc.sents を1回だけ走査）"""
+        starts = []
+        for sent in doc.sents:
+            starts.extend([sent.start_char] * len(sent))
+        return starts
     
-    def _calculate_importance_score(self, token, doc) -> float:
+    def _calculate_importance_score(self, token, sentence_position: float) -> float:
         """重要度スコアを計算"""
         score = 0.0
         
         # 品詞による重み付け
-        pos_weights = {
-            'NOUN': 1.0,
-            'ADJ': 0.8,
-            'VERB': 0.6
-        }
-        score += pos_weights.get(token.pos_, 0.5)
+        score += POS_WEIGHTS.get(token.pos_, 0.5)
         
         # 文字数による重み付け
         if len(token.text) > 3:
@@ -95,14 +250,23 @@ class NLPService:
             score += 0.5
         
         # 文の位置による重み付け
-        sentence_position = token.sent.start_char / len(doc.text)
         if sentence_position < 0.3:  # 文の前半
             score += 0.3
         
         return min(score, 2.0)  # 最大2.0に制限
-    
-    def _count_frequency(self, word: str, text: str) -> int:
-        """単語の出現頻度をカウント"""
-        return text.count(word)
 
-nlp_service = NLPService() 
\ No newline at end of file
+_nlp_service: Optional[NLPService] = None
+_nlp_service_lock = threading.Lock()
+
+def get_nlp_service() -> NLPService:
+    """共有の NLPService を返す（初回呼び出し時にモデルを読み込む）
+
+    import 時にはモデルを読み込まず、アプリの起動処理やワーカープロセスの
+    初期化で呼び出して読み込む。
+    """
+    global _nlp_service
+    if _nlp_service is None:
+        with _nlp_service_lock:
+            if _nlp_service is None:
+                _nlp_service = NLPService()
+    return _nlp_service 
\ No newline at end of file
@@ -0,0 +1,102 @@
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional
+import re
+
+from sudachipy import tokenizer
+
+from app.services.ja_stop_words import STOP_WORDS
+
+# Sudachi の品詞（大分類, 中分類）→ spaCy の UPOS
+POS_MAP = {
+    ("名詞", "普通名詞"): "NOUN",
+    ("名詞", "固有名詞"): "PROPN",
+    ("名詞", "代名詞"): "PRON",
+    ("名詞", "数詞"): "NUM",
+    ("形容詞", None): "ADJ",
+    ("形状詞", None): "ADJ",
+    ("動詞", None): "VERB",
+}
+
+# 文の区切り
+SENTENCE_END = re.compile(r"[。！？!?\n]+")
+
+
+@dataclass
+class SudachiSentence:
+    start_char: int
+    length: int = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+
+@dataclass
+class SudachiToken:
+    """spaCy の Token のうち、キーワード抽出で使う属性だけを持つ"""
+    text: str
+    lemma_: str
+    pos_: str
+    is_stop: bool
+    sent: SudachiSentence
+    ent_type_: str = ""  # Sudachi には固有表現抽出がない
+
+
+@dataclass
+class SudachiDoc:
+    text: str
+    tokens: List[SudachiToken] = field(default_factory=list)
+    sents: List[SudachiSentence] = field(default_factory=list)
+    vector = None  # 文書ベクトルは計算しない
+
+    def __iter__(self) -> Iterator[SudachiToken]:
+        return iter(self.tokens)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+
+class SudachiAnalyzer:
+    """SudachiPy の形態素解析だけで spaCy の nlp 互換の結果を返す軽量エンジン
+
+    係り受け解析・固有表現抽出・文分割モデルを使わず、
+    品詞・原形・文の開始位置だけを求める。
+    """
+
+    def __init__(self, sudachi_tokenizer, mode=tokenizer.Tokenizer.SplitMode.C):
+        self.stop_words = STOP_WORDS
+        self.tokenizer = sudachi_tokenizer
+        self.mode = mode
+        self.meta = {"name": "sudachi", "version": f"split{mode}"}
+
+    def __call__(self, text: str) -> SudachiDoc:
+        sentence_starts = [0] + [m.end() for m in SENTENCE_END.finditer(text) if m.end() < len(text)]
+        doc = SudachiDoc(text)
+        sentence_index = 0
+        sentence = None
+        for morpheme in self.tokenizer.tokenize(text, self.mode):
+            begin = morpheme.begin()
+            while sentence_index + 1 < len(sentence_starts) and sentence_starts[sentence_index + 1] <= begin:
+                sentence_index += 1
+            if sentence is None or sentence.start_char != sentence_starts[sentence_index]:
+                sentence = SudachiSentence(sentence_starts[sentence_index])
+                doc.sents.append(sentence)
+            sentence.length += 1
+
+            surface = morpheme.surface()
+            doc.tokens.append(SudachiToken(
+                text=surface,
+                lemma_=morpheme.dictionary_form(),
+                pos_=_upos(morpheme.part_of_speech()),
+                is_stop=surface in self.stop_words,
+                sent=sentence,
+            ))
+        return doc
+
+    def pipe(self, texts: Iterable[str], batch_size: Optional[int] = None) -> Iterator[SudachiDoc]:
+        for text in texts:
+            yield self(text)
+
+
+def _upos(part_of_speech) -> str:
+    major, minor = part_of_speech[0], part_of_speech[1]
+    return POS_MAP.get((major, minor)) or POS_MAP.get((major, None)) or "X"
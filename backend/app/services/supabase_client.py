@@ -1,7 +1,62 @@
+from typing import Optional
+import threading
+
+import httpx
+from postgrest import AsyncPostgrestClient
+
+from app.core.config import settings
 from app.schemas.chat import ChatMessageSchema
-from app.core.config import supabase  # Supabaseクライアント
 
-def save_message_to_supabase(message: ChatMessageSchema):
+_http_client: Optional[httpx.AsyncClient] = None
+_supabase: Optional[AsyncPostgrestClient] = None
+_supabase_lock = threading.Lock()
+
+def build_http_client() -> httpx.AsyncClient:
+    """Supabaseへのリクエストで共有する、接続プール付きの HTTP クライアント"""
+    return httpx.AsyncClient(
+        http2=settings.SUPABASE_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY_S,
+        ),
+        timeout=httpx.Timeout(settings.SUPABASE_TIMEOUT_S, connect=settings.SUPABASE_CONNECT_TIMEOUT_S),
+        follow_redirects=True,
+    )
+
+def get_supabase() -> AsyncPostgrestClient:
+    """アプリ全体で共有する非同期のSupabase（PostgREST）クライアント
+
+    FastAPI の依存関数としても使う。初回呼び出し時に作成し、
+    接続はアプリの終了時に close_supabase で閉じる。
+    """
+    global _http_client, _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                key = settings.SUPABASE_SERVICE_ROLE_KEY
+                _http_client = build_http_client()
+                _supabase = AsyncPostgrestClient(
+                    f"{settings.SUPABASE_URL}/rest/v1",
+                    headers={
+                        "Accept": "application/json",
+                        "Content-Type": "application/json",
+                        "apikey": key,
+                        "Authorization": f"Bearer {key}",
+                    },
+                    http_client=_http_client,
+                )
+    return _supabase
+
+async def close_supabase():
+    """共有クライアントの接続を閉じる"""
+    global _http_client, _supabase
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _supabase = None
+
+async def save_message_to_supabase(supabase: AsyncPostgrestClient, message: ChatMessageSchema):
     data = {
         "chat_room_id": message.chat_room_id,
         "sender_token": message.sender_token,
@@ -9,6 +64,5 @@ def save_message_to_supabase(message: ChatMessageSchema):
         "created_at": message.created_at
     }
 
-    response = supabase.table("messages").insert(data).execute()
-    if response.error:
-        raise Exception(f"Failed to save message: {response.error}")
\ No newline at end of file
+    # 失敗時は APIError が送出される
+    await supabase.table("messages").insert(data).execute()
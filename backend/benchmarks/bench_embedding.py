@@ -0,0 +1,68 @@
+"""埋め込み類似度とキーワードJaccardの比較ベンチマーク
+
+同じ合成データに対して、Jaccard（疎行列版）と文書ベクトルのコサイン類似度で
+類似ペアを求め、処理時間と、Jaccardで類似と判定されたペアの再現率を表示する。
+
+    python -m benchmarks.bench_embedding --sizes 1000 5000 --threshold 0.85
+"""
+from typing import Dict
+import argparse
+import time
+
+from app.services import embedding, jaccard_sparse
+from app.services.matcher import SIMILARITY_THRESHOLD, EMBEDDING_THRESHOLD
+from benchmarks.synthetic import SyntheticConfig, SyntheticDiaryGenerator
+
+COLUMNS = ["diaries", "jaccard_s", "embedding_s", "jaccard_pairs", "embedding_pairs", "recall"]
+
+
+def run_case(size: int, threshold: float, dim: int, noise: float, seed: int) -> Dict:
+    """1つの感情グループ相当のデータで類似ペアの探索を比較する"""
+    config = SyntheticConfig(diaries=size, seed=seed, embedding_dim=dim, embedding_noise=noise)
+    tables = SyntheticDiaryGenerator(config).generate()
+
+    keywords: Dict[str, set] = {d["id"]: set() for d in tables["diary"]}
+    for row in tables["parsed_keyword"]:
+        keywords[row["diaryid"]].add(row["word"])
+    ids = [d["id"] for d in tables["diary"]]
+    vectors = [embedding.decode_vector(d["embedding"]) for d in tables["diary"]]
+
+    started = time.perf_counter()
+    jaccard_edges = jaccard_sparse.similar_edges([keywords[i] for i in ids], SIMILARITY_THRESHOLD)
+    jaccard_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    embedding_edges = embedding.similar_edges(vectors, threshold)
+    embedding_time = time.perf_counter() - started
+
+    expected = {(i, j) for _, i, j in jaccard_edges}
+    found = {(i, j) for _, i, j in embedding_edges}
+    recall = len(expected & found) / len(expected) if expected else 1.0
+
+    return {
+        "diaries": size,
+        "jaccard_s": round(jaccard_time, 4),
+        "embedding_s": round(embedding_time, 4),
+        "jaccard_pairs": len(expected),
+        "embedding_pairs": len(found),
+        "recall": round(recall, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding and Jaccard similarity search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--threshold", type=float, default=EMBEDDING_THRESHOLD)
+    parser.add_argument("--dim", type=int, default=96)
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(" | ".join(f"{name:>15}" for name in COLUMNS))
+    for size in args.sizes:
+        result = run_case(size, args.threshold, args.dim, args.noise, args.seed)
+        print(" | ".join(f"{result[name]:>15}" for name in COLUMNS))
+
+
+if __name__ == "__main__":
+    main()
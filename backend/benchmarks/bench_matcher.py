@@ -0,0 +1,177 @@
+"""マッチング処理のベンチマーク
+
+合成した日記とキーワードを読み込み先に入れ、match_and_create_rooms と
+同じ処理（run_sweep）を実行して計測する。読み込み先は MATCH_SOURCE と同じく
+supabase（インメモリのSupabase代替 + MatchRepository）か local（一時SQLiteファイル +
+LocalMatchRepository）を選べる。local ではアプリの SessionLocal を一時ファイルに向け直す。
+
+    python -m benchmarks.bench_matcher --sizes 1000 10000 100000 --output baseline.json
+    python -m benchmarks.bench_matcher --baseline baseline.json
+    python -m benchmarks.bench_matcher --source local --sizes 1000 10000
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+
+from app.db.models import Base, Diary, Vocabulary
+from app.db.session import SessionLocal
+from app.services.keyword_store import FORMAT_V2, KEYWORD_RECORD, POS_CODE
+from app.services.match_repository import LocalMatchRepository, MatchRepository
+from app.services.match_sweep import run_sweep
+from app.services.matcher import GroupingMode, ScoringBackend
+from benchmarks.fake_supabase import FakeSupabase
+from benchmarks.synthetic import SyntheticConfig, SyntheticDiaryGenerator
+
+COLUMNS = ["diaries", "source", "backend", "mode", "wall_time_s", "round_trips", "pairs_scored", "rooms", "match_rate"]
+
+
+def pack_word_ids(word_ids: List[int]) -> bytes:
+    """語彙IDを NLPジョブと同じ packed 配列（形式2）にする"""
+    data = bytearray([FORMAT_V2])
+    for word_id in word_ids:
+        data += KEYWORD_RECORD.pack(word_id, 1.0, word_id, 1, POS_CODE["NOUN"])
+    return bytes(data)
+
+
+def load_local(tables: Dict[str, List[Dict]], directory: str):
+    """合成データを一時SQLiteファイルに入れ、SessionLocal をそのファイルに向ける"""
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal.configure(bind=engine)
+
+    # 合成語 "w00042" の語彙IDは 42
+    words: Dict[str, List[int]] = {}
+    for row in tables["parsed_keyword"]:
+        words.setdefault(row["diaryid"], []).append(int(row["word"][1:]))
+    vocabulary = sorted({row["word"] for row in tables["parsed_keyword"]})
+
+    with engine.begin() as connection:
+        connection.execute(insert(Vocabulary), [{"id": int(word[1:]), "word": word} for word in vocabulary])
+        connection.execute(insert(Diary), [
+            {
+                "id": diary["id"],
+                "content": "",
+                "emotion_tag": diary["emotion"],
+                "created_at": datetime.fromisoformat(diary["create_at"]),
+                "matched": False,
+                "keyword_ids": pack_word_ids(words.get(diary["id"], [])),
+                # PostgRESTの bytea 形式（"\\x" + 16進）を元のバイト列に戻す
+                "embedding": bytes.fromhex(diary["embedding"][2:]) if "embedding" in diary else None,
+            }
+            for diary in tables["diary"]
+        ])
+    return engine
+
+
+def run_case(
+    size: int,
+    backend: ScoringBackend,
+    mode: GroupingMode,
+    executor: Executor,
+    latency: float,
+    seed: int,
+    source: str = "supabase",
+) -> Dict:
+    """1つのデータ規模でマッチングを実行し、計測結果を返す"""
+    now = datetime.utcnow()
+    # 埋め込みバックエンドの場合は ja_core_news_sm と同じ96次元のベクトルも生成
+    embedding_dim = 96 if backend == ScoringBackend.EMBEDDING else 0
+    config = SyntheticConfig(diaries=size, seed=seed, embedding_dim=embedding_dim)
+    tables = SyntheticDiaryGenerator(config).generate(now)
+    if source == "local":
+        with tempfile.TemporaryDirectory(prefix="bench-matcher-") as directory:
+            engine = load_local(tables, directory)
+            try:
+                return _measure(size, source, backend, mode, executor, LocalMatchRepository(), now)
+            finally:
+                engine.dispose()
+    client = FakeSupabase(tables, latency=latency)
+    return _measure(size, source, backend, mode, executor, MatchRepository(client), now)
+
+
+def _measure(
+    size: int,
+    source: str,
+    backend: ScoringBackend,
+    mode: GroupingMode,
+    executor: Executor,
+    repo: Union[LocalMatchRepository, MatchRepository],
+    now: datetime,
+) -> Dict:
+    started = time.perf_counter()
+    result = asyncio.run(run_sweep(repo, backend, mode, executor=executor, now=now))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "diaries": size,
+        "source": source,
+        "backend": backend.value,
+        "mode": mode.value,
+        "wall_time_s": round(elapsed, 4),
+        "round_trips": repo.round_trips,
+        "pairs_scored": result["pairs_scored"],
+        "rooms": len(result["matched_groups"]),
+        "match_rate": round(result["match_rate"], 4),
+    }
+
+
+def print_report(results: List[Dict], baseline: Optional[List[Dict]] = None):
+    """計測結果を表形式で表示（ベースラインがあれば比率も表示）"""
+    reference = {(r["diaries"], r.get("source", "supabase")): r for r in baseline or []}
+    header = COLUMNS + (["vs_baseline"] if baseline else [])
+    print(" | ".join(f"{name:>13}" for name in header))
+    for result in results:
+        cells = [f"{result[name]:>13}" for name in COLUMNS]
+        if baseline:
+            base = reference.get((result["diaries"], result["source"]))
+            ratio = f"{result['wall_time_s'] / base['wall_time_s']:.2f}x" if base and base["wall_time_s"] else "-"
+            cells.append(f"{ratio:>13}")
+        print(" | ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the diary matcher against synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backend", choices=[b.value for b in ScoringBackend], default=ScoringBackend.PYTHON.value)
+    parser.add_argument("--mode", choices=[m.value for m in GroupingMode], default=GroupingMode.ANCHOR.value)
+    parser.add_argument("--workers", type=int, default=0, help="process pool size (0 = run shards in one thread)")
+    parser.add_argument("--source", choices=["supabase", "local"], default="supabase", help="match data source (MATCH_SOURCE)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency per Supabase round trip")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    args = parser.parse_args()
+
+    backend = ScoringBackend(args.backend)
+    mode = GroupingMode(args.mode)
+    executor = ProcessPoolExecutor(args.workers) if args.workers else ThreadPoolExecutor(1)
+    try:
+        results = [
+            run_case(size, backend, mode, executor, args.latency_ms / 1000, args.seed, args.source)
+            for size in args.sizes
+        ]
+    finally:
+        executor.shutdown()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
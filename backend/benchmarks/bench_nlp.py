@@ -0,0 +1,74 @@
+"""キーワード抽出エンジンのレイテンシ比較
+
+    python -m benchmarks.bench_nlp --engines spacy spacy_lite sudachi --texts 200
+"""
+from typing import Dict, List
+import argparse
+import random
+import statistics
+import time
+
+from app.services.keyword_cache import KeywordCache
+from app.services.nlp_service import ENGINES, NLPService
+
+# 日記らしい短文を組み合わせてテキストを作る
+SENTENCES = [
+    "今日は仕事で疲れた。", "朝から雨が降っていて気分が重い。", "友達と久しぶりにご飯を食べて楽しかった。",
+    "なんだか寂しい夜だ。", "明日のプレゼンが不安で眠れない。", "散歩をしたら少し落ち着いた。",
+    "上司に怒られてイライラしている。", "家族に感謝の気持ちを伝えたい。", "好きな音楽を聴いて元気が出た。",
+    "一人でいると孤独を感じる。", "新しい本を読み始めてワクワクしている。", "電車が遅れて会議に間に合わなかった。",
+]
+
+COLUMNS = ["engine", "load_s", "mean_ms", "p50_ms", "p99_ms", "batch_texts_per_s"]
+
+
+def make_texts(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return ["".join(rng.choices(SENTENCES, k=rng.randint(1, 12))) for _ in range(count)]
+
+
+def run_engine(engine: str, texts: List[str]) -> Dict:
+    started = time.perf_counter()
+    service = NLPService(engine=engine)
+    load_time = time.perf_counter() - started
+    # キャッシュのヒットで計測が歪まないよう無効化する
+    service.cache = KeywordCache(service.engine, max_size=0)
+
+    service.extract_keywords(texts[0])  # ウォームアップ
+    latencies = []
+    for text in texts:
+        started = time.perf_counter()
+        service.extract_keywords(text)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    service.analyze_batch(texts, batch_size=32)
+    batch_time = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "engine": service.engine,
+        "load_s": round(load_time, 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+        "batch_texts_per_s": round(len(texts) / batch_time, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare keyword extraction engines")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.seed)
+    print(" | ".join(f"{name:>17}" for name in COLUMNS))
+    for engine in args.engines:
+        result = run_engine(engine, texts)
+        print(" | ".join(f"{result[name]:>17}" for name in COLUMNS))
+
+
+if __name__ == "__main__":
+    main()
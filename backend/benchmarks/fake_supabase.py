@@ -0,0 +1,184 @@
+from copy import deepcopy
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+
+
+@dataclass
+class FakeResponse:
+    data: List[Dict]
+
+
+def _parse_value(value: str) -> Any:
+    return {"null": None, "true": True, "false": False}.get(value, value)
+
+
+def _condition(expression: str) -> Callable[[Dict], bool]:
+    """"column.op.value" 形式の条件を判定関数に変換"""
+    column, op, value = expression.split(".", 2)
+    value = _parse_value(value)
+    if op == "is":
+        return lambda row: row.get(column) is value
+    if op == "eq":
+        return lambda row: row.get(column) == value
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+class FakeQuery:
+    """PostgRESTクエリビルダーのうち、マッチング処理が使う部分だけを再現"""
+
+    def __init__(self, client: "FakeSupabase", table: str):
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.columns: Optional[List[str]] = None
+        self.payload: Any = None
+        self.filters: List[Callable[[Dict], bool]] = []
+        self.orders: List[str] = []
+        self.bounds: Optional[tuple] = None
+        self.lookup: Optional[tuple] = None
+
+    # --- 操作 ---
+    def select(self, columns: str = "*"):
+        self.action = "select"
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, rows):
+        self.action = "insert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values: Dict):
+        self.action = "update"
+        self.payload = values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- 条件 ---
+    def eq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column: str, values):
+        values = set(values)
+        if self.lookup is None:
+            # 列インデックスで候補行を絞り込む
+            self.lookup = (column, values)
+        else:
+            self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def gte(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def lte(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] <= value)
+        return self
+
+    def lt(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def or_(self, filters: str):
+        conditions = [_condition(expression) for expression in filters.split(",")]
+        self.filters.append(lambda row: any(condition(row) for condition in conditions))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.orders.append(column)
+        return self
+
+    def range(self, start: int, end: int):
+        self.bounds = (start, end)
+        return self
+
+    def limit(self, count: int):
+        self.bounds = (0, count - 1)
+        return self
+
+    # --- 実行 ---
+    def _matching(self) -> List[Dict]:
+        if self.lookup is not None:
+            column, values = self.lookup
+            index = self.client.column_index(self.table, column)
+            rows = [row for value in values for row in index.get(value, [])]
+            rows.sort(key=lambda row: row["_position"])
+        else:
+            rows = self.client.tables.setdefault(self.table, [])
+        return [row for row in rows if all(f(row) for f in self.filters)]
+
+    async def execute(self) -> FakeResponse:
+        self.client.round_trips += 1
+        if self.client.latency:
+            await asyncio.sleep(self.client.latency)
+
+        if self.action == "insert":
+            rows = self.client.tables.setdefault(self.table, [])
+            inserted = []
+            for row in deepcopy(self.payload):
+                self.client.next_id += 1
+                row.setdefault("id", self.client.next_id)
+                rows.append(row)
+                inserted.append(row)
+            self.client.invalidate(self.table)
+            return FakeResponse(inserted)
+
+        if self.action == "update":
+            matched = self._matching()
+            for row in matched:
+                row.update(self.payload)
+            self.client.invalidate(self.table)
+            return FakeResponse(matched)
+
+        if self.action == "delete":
+            matched = self._matching()
+            ids = {id(row) for row in matched}
+            self.client.tables[self.table] = [row for row in self.client.tables[self.table] if id(row) not in ids]
+            self.client.invalidate(self.table)
+            return FakeResponse(matched)
+
+        rows = self._matching()
+        for column in reversed(self.orders):
+            rows.sort(key=lambda row: row.get(column))
+        if self.bounds is not None:
+            rows = rows[self.bounds[0]:self.bounds[1] + 1]
+        if self.columns is not None:
+            rows = [{c: row.get(c) for c in self.columns} for row in rows]
+        else:
+            rows = [{k: v for k, v in row.items() if k != "_position"} for row in rows]
+        return FakeResponse(rows)
+
+
+class FakeSupabase:
+    """Supabaseテーブルのインメモリ代替（往復回数と擬似レイテンシ付き）"""
+
+    def __init__(self, tables: Optional[Dict[str, List[Dict]]] = None, latency: float = 0.0):
+        self.tables = tables if tables is not None else {}
+        self.latency = latency
+        self.round_trips = 0
+        self.next_id = 0
+        self._indexes: Dict[tuple, Dict[Any, List[Dict]]] = {}
+
+    def column_index(self, table: str, column: str) -> Dict[Any, List[Dict]]:
+        """in_() 用の列インデックス（値 → 行）"""
+        key = (table, column)
+        if key not in self._indexes:
+            index: Dict[Any, List[Dict]] = {}
+            for position, row in enumerate(self.tables.setdefault(table, [])):
+                row["_position"] = position
+                index.setdefault(row.get(column), []).append(row)
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def invalidate(self, table: str):
+        """テーブル変更時に列インデックスを破棄"""
+        for key in [key for key in self._indexes if key[0] == table]:
+            del self._indexes[key]
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List, Optional
+import random
+import uuid
+
+from app.schemas.diary import EmotionTag
+from app.services.embedding import encode_vector, np
+
+
+@dataclass
+class SyntheticConfig:
+    diaries: int = 1000
+    vocabulary_size: int = 2000
+    zipf_exponent: float = 1.1  # キーワード出現頻度のZipf指数
+    min_keywords: int = 3
+    max_keywords: int = 10
+    topics: int = 100  # 話題の数。日記は1つの話題から大半のキーワードを選ぶ
+    topic_size: int = 6  # 話題ごとの語彙（全体の語彙からZipf分布で選ぶ）
+    topic_zipf_exponent: float = 1.0  # 話題の人気のZipf指数
+    topic_share: float = 0.85  # キーワードのうち話題の語彙から選ぶ割合（残りは全体の語彙から）
+    topic_emotion_share: float = 0.8  # 話題ごとの主な感情で投稿する割合
+    span: timedelta = timedelta(hours=24)  # 投稿時刻を散らす期間
+    evening_share: float = 0.4  # 夜（20〜24時）に集中する投稿の割合
+    embedding_dim: int = 0  # 文書ベクトルの次元（0なら生成しない）
+    embedding_noise: float = 0.5  # 単語ベクトルの和に加えるノイズの大きさ
+    seed: int = 42
+
+
+class SyntheticDiaryGenerator:
+    """ベンチマーク用の日記とキーワードを生成する
+
+    実際の日記は同じ話題（仕事、天気、部活など）の語を共有するため、話題ごとの
+    小さな語彙を作り、各日記は1つの話題の語彙から大半のキーワードを選ぶ。
+    語彙全体から独立に選ぶと、しきい値 0.7 を超える組がほとんど生まれない。
+    """
+
+    def __init__(self, config: SyntheticConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.vocabulary = [f"w{rank:05d}" for rank in range(1, config.vocabulary_size + 1)]
+        weights = [1 / rank ** config.zipf_exponent for rank in range(1, config.vocabulary_size + 1)]
+        self.cum_weights = list(accumulate(weights))
+        self.emotions = [tag.value for tag in EmotionTag]
+        self.topics = [self._zipf_sample(config.topic_size) for _ in range(config.topics)]
+        self.topic_emotions = [self.random.choice(self.emotions) for _ in range(config.topics)]
+        self.topic_cum_weights = list(accumulate(
+            1 / rank ** config.topic_zipf_exponent for rank in range(1, config.topics + 1)
+        ))
+        self.word_vectors = None
+        if config.embedding_dim:
+            # 単語ごとのランダムなベクトルの和を文書ベクトルとし、キーワードと相関させる
+            self.numpy_random = np.random.default_rng(config.seed)
+            self.word_vectors = {
+                word: self.numpy_random.standard_normal(config.embedding_dim).astype(np.float32)
+                for word in self.vocabulary
+            }
+
+    def _timestamp(self, end: datetime) -> datetime:
+        start = end - self.config.span
+        if self.random.random() < self.config.evening_share:
+            # 夜の投稿ピーク（期間最後の4時間）
+            offset = self.config.span - timedelta(hours=4) * self.random.random()
+        else:
+            offset = self.config.span * self.random.random()
+        return start + offset
+
+    def _zipf_sample(self, count: int) -> List[str]:
+        """全体の語彙からZipf分布で count 語を重複なく選ぶ"""
+        words = set()
+        while len(words) < count:
+            words.update(self.random.choices(self.vocabulary, cum_weights=self.cum_weights, k=count - len(words)))
+        return sorted(words)
+
+    def _topic(self) -> int:
+        return self.random.choices(range(self.config.topics), cum_weights=self.topic_cum_weights)[0]
+
+    def _emotion(self, topic: int) -> str:
+        if self.random.random() < self.config.topic_emotion_share:
+            return self.topic_emotions[topic]
+        return self.random.choice(self.emotions)
+
+    def _keywords(self, topic: int) -> List[str]:
+        count = self.random.randint(self.config.min_keywords, self.config.max_keywords)
+        topic_count = min(
+            sum(self.random.random() < self.config.topic_share for _ in range(count)),
+            len(self.topics[topic]),
+        )
+        words = set(self.random.sample(self.topics[topic], topic_count))
+        while len(words) < count:
+            words.update(self.random.choices(self.vocabulary, cum_weights=self.cum_weights, k=count - len(words)))
+        return sorted(words)
+
+    def _embedding(self, words: List[str]) -> str:
+        vector = sum(self.word_vectors[word] for word in words)
+        vector = vector + self.config.embedding_noise * self.numpy_random.standard_normal(self.config.embedding_dim)
+        # PostgRESTが bytea を返す形式（"\\x" + 16進）
+        return "\\x" + encode_vector(vector).hex()
+
+    def generate(self, now: Optional[datetime] = None) -> Dict[str, List[Dict]]:
+        """Supabaseの diary / parsed_keyword テーブル相当の行を生成"""
+        now = now or datetime.utcnow()
+        diaries = []
+        keywords = []
+        for _ in range(self.config.diaries):
+            diary_id = str(uuid.UUID(int=self.random.getrandbits(128)))
+            topic = self._topic()
+            words = self._keywords(topic)
+            diary = {
+                "id": diary_id,
+                "userid": str(uuid.UUID(int=self.random.getrandbits(128))),
+                "emotion": self._emotion(topic),
+                "create_at": self._timestamp(now).isoformat(),
+                "matched": None,
+            }
+            if self.word_vectors is not None:
+                diary["embedding"] = self._embedding(words)
+            diaries.append(diary)
+            for word in words:
+                keywords.append({"id": len(keywords) + 1, "diaryid": diary_id, "word": word})
+        return {"diary": diaries, "parsed_keyword": keywords, "chat_rooms": []}
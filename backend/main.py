@@ -1,10 +1,12 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import create_client, Client
+from postgrest import AsyncPostgrestClient
 from dotenv import load_dotenv
 
 from app.api import chat, match
+from app.services.supabase_client import close_supabase, get_supabase
 
 # .env 読み込み
 load_dotenv("./.env")
@@ -15,16 +17,21 @@ SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")  # service_role を使う
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise RuntimeError("Supabase URL or Key not found in environment variables")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Supabase クライアントをアプリに登録（全リクエストで接続プールを共有する）
+    app.state.supabase = get_supabase()
+    yield
+    await close_supabase()
+
 # FastAPI アプリ生成
 app = FastAPI(
     title="Mental Diary Matching API",
     description="Supabase + FastAPI バックエンド",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Supabase クライアントをアプリに登録
-app.state.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 # CORS 設定（必要に応じて allow_origins を制限）
 app.add_middleware(
     CORSMiddleware,
@@ -46,11 +53,9 @@ async def root():
 @app.get("/healthcheck")
 async def healthcheck():
     try:
-        supabase: Client = app.state.supabase
-        res = supabase.table("diary_posts").select("id").limit(1).execute()
-
-        if res.status_code >= 400:
-            raise HTTPException(status_code=500, detail="Supabase query failed")
+        supabase: AsyncPostgrestClient = app.state.supabase
+        # 失敗時は APIError が送出される
+        res = await supabase.table("diary_posts").select("id").limit(1).execute()
 
         return {"status": "connected", "rows_checked": len(res.data)}
     except Exception as e:
@@ -0,0 +1,58 @@
+"""Alembic の実行環境
+
+スキーマは app/db/models.py を正とし、変更は必ずマイグレーションで適用する。
+マイグレーション導入前に作成済みのDBでは、テーブルが 0001 と一致することを
+確認してから `alembic stamp 0001` を実行し、以降を upgrade で適用する。
+"""
+from logging.config import fileConfig
+
+from alembic import context
+import sqlalchemy as sa
+
+from app.db.models import Base
+from app.db.session import DATABASE_URL, engine
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def compare_type(context, inspected_column, metadata_column, inspected_type, metadata_type):
+    # SQLite には UUID 型がなく CHAR(32) で保存されるため、型の差分として扱わない
+    if context.dialect.name == "sqlite" and isinstance(metadata_type, sa.Uuid):
+        return False
+    return None
+
+
+def run_migrations_offline():
+    """DBに接続せず、SQLを出力する（alembic upgrade head --sql）"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=DATABASE_URL.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite は ALTER TABLE が限られるため、テーブルを作り直して変更する
+            render_as_batch=connection.dialect.name == "sqlite",
+            compare_type=compare_type,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,138 @@
+"""initial schema
+
+既存のテーブルと、マイグレーション導入前にモデルで定義していたインデックス。
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "diaries",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("emotion_tag", sa.String(), nullable=True),
+        sa.Column("keywords", sa.JSON(), nullable=True),
+        sa.Column("embedding", sa.LargeBinary(), nullable=True),
+        sa.Column("keyword_ids", sa.LargeBinary(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_diaries_created_at_id", "diaries", ["created_at", "id"])
+    op.create_index("ix_diaries_emotion_tag_created_at_id", "diaries", ["emotion_tag", "created_at", "id"])
+
+    op.create_table(
+        "vocabulary",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("word", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("word"),
+    )
+
+    op.create_table(
+        "nlp_jobs",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("diary_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_run_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["diary_id"], ["diaries.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_nlp_jobs_status_next_run_at", "nlp_jobs", ["status", "next_run_at"])
+
+    op.create_table(
+        "parsed_keywords",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("diary_id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("word", sa.String(), nullable=False),
+        sa.Column("frequency", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["diary_id"], ["diaries.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_parsed_keywords_word_created_at", "parsed_keywords", ["word", "created_at"])
+    op.create_index("ix_parsed_keywords_diary_id", "parsed_keywords", ["diary_id"])
+
+    op.create_table(
+        "match_table",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("room_id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("matched_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    op.create_table(
+        "messages",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("match_id", sa.Integer(), nullable=False),
+        sa.Column("sender_id", sa.String(), nullable=False),
+        sa.Column("receiver_id", sa.String(), nullable=True),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("send_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["match_id"], ["match_table.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    op.create_table(
+        "chat_rooms",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("participants", sa.JSON(), nullable=False),
+        sa.Column("empathy_words", sa.JSON(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    op.create_table(
+        "notifications",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("type", sa.String(), nullable=True),
+        sa.Column("anonymous_token", sa.String(), nullable=True),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("message", sa.Text(), nullable=True),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("is_read", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("notifications")
+    op.drop_table("chat_rooms")
+    op.drop_table("messages")
+    op.drop_table("match_table")
+    op.drop_index("ix_parsed_keywords_diary_id", table_name="parsed_keywords")
+    op.drop_index("ix_parsed_keywords_word_created_at", table_name="parsed_keywords")
+    op.drop_table("parsed_keywords")
+    op.drop_index("ix_nlp_jobs_status_next_run_at", table_name="nlp_jobs")
+    op.drop_table("nlp_jobs")
+    op.drop_table("vocabulary")
+    op.drop_index("ix_diaries_emotion_tag_created_at_id", table_name="diaries")
+    op.drop_index("ix_diaries_created_at_id", table_name="diaries")
+    op.drop_table("diaries")
@@ -0,0 +1,60 @@
+"""hot path indexes
+
+crud とジョブワーカーのクエリが絞り込む列のインデックス。
+
+- diaries.expires_at: 期限切れの日記の削除
+- messages (match_id, send_at): マッチごとのメッセージを送信順に取得
+- chat_rooms.expires_at: 有効なルーム・期限が近いルームの取得
+- notifications (anonymous_token, created_at): トークンごとの通知
+- nlp_jobs (next_run_at, id) WHERE status = 'pending': ジョブの取り出し（部分インデックス）
+
+Postgres では書き込みを止めないよう CREATE INDEX CONCURRENTLY で作成する。
+モデルから作成済みのDBでも適用できるよう IF NOT EXISTS を付ける。
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PENDING = sa.text("status = 'pending'")
+
+# (インデックス名, テーブル, 列, 部分インデックスの条件)
+INDEXES = [
+    ("ix_diaries_expires_at", "diaries", ["expires_at"], None),
+    ("ix_messages_match_id_send_at", "messages", ["match_id", "send_at"], None),
+    ("ix_chat_rooms_expires_at", "chat_rooms", ["expires_at"], None),
+    ("ix_notifications_anonymous_token_created_at", "notifications", ["anonymous_token", "created_at"], None),
+    ("ix_nlp_jobs_pending_next_run_at", "nlp_jobs", ["next_run_at", "id"], PENDING),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY はトランザクションの外でしか実行できない
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_where=where,
+                sqlite_where=where,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,32 @@
+"""diary matched flag
+
+日記がチャットルームに入ったかどうか。一括マッチングと逐次マッチャーの両方が
+同じフラグを条件付きで更新し、1つの日記が2つのルームに入らないようにする。
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("diaries") as batch_op:
+        batch_op.add_column(sa.Column("matched", sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("diaries") as batch_op:
+        batch_op.drop_column("matched")
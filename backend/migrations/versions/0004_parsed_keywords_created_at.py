@@ -0,0 +1,39 @@
+"""parsed keywords by time window
+
+/api/empathy-words が期間内のキーワードを (created_at, word) のインデックスだけで
+読めるようにする。
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_parsed_keywords_created_at_word", "parsed_keywords", ["created_at", "word"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_parsed_keywords_created_at_word", table_name="parsed_keywords",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,33 @@
+"""nlp job lease
+
+実行中のジョブに期限（locked_until）を持たせる。処理中のプロセスが期限を延長し、
+期限の切れたジョブだけをキューに戻すため、複数のプロセスが同時に動いていても
+他のプロセスが処理中のジョブを奪わない。
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("nlp_jobs") as batch_op:
+        batch_op.add_column(sa.Column("locked_until", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("nlp_jobs") as batch_op:
+        batch_op.drop_column("locked_until")
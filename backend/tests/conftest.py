@@ -0,0 +1,26 @@
+import os
+import tempfile
+
+# app.db.session はインポート時にエンジンを作るため、設定はインポート前に済ませる
+_db_dir = tempfile.mkdtemp(prefix="nazomi-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ.setdefault("NLP_ENGINE", "sudachi")
+os.environ.setdefault("NLP_WORKERS", "0")
+os.environ.setdefault("ENCRYPTION_KEY", "cipdSsOzxgCP1WkdFToo8ktM06lZwnkhoqZf2xz9JwU=")
+
+import pytest
+
+
+@pytest.fixture
+def db_tables():
+    """テストごとに空のテーブルを作り直す"""
+    from app.db.models import Base
+    from app.db.session import engine
+    from app.services.keyword_store import vocabulary
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # 語彙IDはテーブルごとに振り直されるため、プロセス内の対応表も捨てる
+    vocabulary.clear()
+    yield engine
+    Base.metadata.drop_all(bind=engine)
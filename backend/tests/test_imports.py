@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+
+def run_python(code: str):
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=os.environ.copy(),
+        capture_output=True,
+    )
+
+
+def test_importing_the_app_does_not_load_spacy():
+    # spaCy はモデルの読み込み時（起動後のウォームアップ）まで読み込まない
+    result = run_python("import sys, app.main; sys.exit('spacy' in sys.modules)")
+    assert result.returncode == 0, result.stderr.decode()
+
+
+def test_the_sudachi_engine_runs_without_spacy():
+    result = run_python(
+        "import sys\n"
+        "from app.services.nlp_service import NLPService\n"
+        "service = NLPService('sudachi')\n"
+        "assert service.engine == 'sudachi'\n"
+        "service.analyze('今日は海で友達と泳いだ。')\n"
+        "sys.exit('spacy' in sys.modules)"
+    )
+    assert result.returncode == 0, result.stderr.decode()
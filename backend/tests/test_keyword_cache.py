@@ -0,0 +1,55 @@
+from itertools import count
+import sqlite3
+
+from app.services import keyword_cache
+from app.services.keyword_cache import KeywordCache
+
+
+def result(word: str):
+    return [{"word": word, "importance_score": 1.0}], b"\x00\x01"
+
+
+def disk_keys(path: str):
+    with sqlite3.connect(path) as connection:
+        return {row[0] for row in connection.execute("SELECT key FROM keyword_cache")}
+
+
+def test_memory_tier_evicts_the_least_recently_used_entry():
+    cache = KeywordCache("v1", max_size=2)
+    cache.put("a", result("a"))
+    cache.put("b", result("b"))
+    assert cache.get("a") == result("a")
+
+    cache.put("c", result("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == result("a")
+    assert cache.get("c") == result("c")
+
+
+def test_disk_tier_survives_a_restart_and_keys_include_the_model_version(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    KeywordCache("v1", max_size=0, disk_path=path).put("今日は　晴れ", result("晴れ"))
+
+    # 正規化したテキストが同じなら、再起動後もディスクから読める
+    assert KeywordCache("v1", disk_path=path).get("今日は 晴れ") == result("晴れ")
+    assert KeywordCache("v2", disk_path=path).get("今日は 晴れ") is None
+
+
+def test_disk_tier_keeps_the_most_recently_used_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(keyword_cache, "DISK_EVICT_EVERY", 1)
+    clock = count()
+    monkeypatch.setattr(keyword_cache.time, "time", lambda: next(clock))
+    path = str(tmp_path / "cache.sqlite3")
+    cache = KeywordCache("v1", max_size=0, disk_path=path, disk_max_size=2)
+
+    cache.put("a", result("a"))
+    cache.put("b", result("b"))
+    assert cache.get("a") == result("a")  # b より a が最近使われた
+    cache.put("c", result("c"))
+
+    assert disk_keys(path) == {cache.key("a"), cache.key("c")}
+
+    # 上限を下げて開き直すと、その時点で削る
+    reopened = KeywordCache("v1", max_size=0, disk_path=path, disk_max_size=1)
+    assert disk_keys(path) == {reopened.key("c")}
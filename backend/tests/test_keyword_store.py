@@ -0,0 +1,48 @@
+import pytest
+
+from app.services.keyword_store import (
+    KEYWORD_PAIR,
+    keyword_id_set,
+    keywords_for_api,
+    pack_keywords,
+    unpack_keywords,
+    vocabulary,
+)
+
+pytestmark = pytest.mark.usefixtures("db_tables")
+
+KEYWORDS = [
+    {"word": "走る", "original": "走っ", "pos": "VERB", "importance_score": 0.9, "frequency": 2},
+    {"word": "海", "original": "海", "pos": "NOUN", "importance_score": 0.5, "frequency": 1},
+    # 同じ原形は先頭（重要度の高い方）だけ残す
+    {"word": "走る", "original": "走り", "pos": "VERB", "importance_score": 0.1, "frequency": 2},
+]
+
+
+def test_pack_and_unpack_keep_the_api_shape():
+    data = pack_keywords(KEYWORDS)
+    ids = vocabulary.intern(["走る", "海"])
+
+    assert unpack_keywords(data) == [(ids["走る"], pytest.approx(0.9)), (ids["海"], pytest.approx(0.5))]
+    assert keyword_id_set(data) == {ids["走る"], ids["海"]}
+    assert keywords_for_api(data) == [
+        {"word": "走る", "original": "走っ", "pos": "VERB", "importance_score": 0.9, "frequency": 2},
+        {"word": "海", "original": "海", "pos": "NOUN", "importance_score": 0.5, "frequency": 1},
+    ]
+
+
+def test_empty_keywords_round_trip():
+    data = pack_keywords([])
+    assert unpack_keywords(data) == []
+    assert keywords_for_api(data) == []
+
+
+def test_packed_pairs_written_before_the_versioned_format_still_read():
+    ids = vocabulary.intern(["空", "雲"])
+    data = KEYWORD_PAIR.pack(ids["空"], 0.75) + KEYWORD_PAIR.pack(ids["雲"], 0.25)
+
+    assert keyword_id_set(data) == {ids["空"], ids["雲"]}
+    assert keywords_for_api(data) == [
+        {"word": "空", "importance_score": 0.75},
+        {"word": "雲", "importance_score": 0.25},
+    ]
@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+import asyncio
+
+import pytest
+
+from app.db.models import ChatRoom, Diary, NLPJob
+from app.db.session import SessionLocal
+from app.services import embedding
+from app.services.incremental_matcher import DiariesAlreadyMatched, IncrementalMatcher
+from app.services.keyword_store import vocabulary
+from app.services.match import create_room_for_diaries, load_unmatched_diaries
+from app.services.match_repository import LocalMatchRepository
+from app.services.match_sweep import run_sweep
+from app.services.matcher import ScoringBackend
+from app.services.nlp_jobs import NLPJobWorker
+
+pytestmark = pytest.mark.usefixtures("db_tables")
+
+
+def add_diary(db, content: str = "x", emotion: Optional[str] = "sad") -> Tuple[str, int]:
+    """日記とNLPジョブを保存し、(日記ID, ジョブID) を返す"""
+    diary = Diary(content=content, emotion_tag=emotion)
+    db.add(diary)
+    db.flush()
+    job = NLPJob(diary_id=diary.id)
+    db.add(job)
+    db.commit()
+    return diary.id, job.id
+
+
+def save_analysis(worker: NLPJobWorker, job_id: int, diary_id: str, words, vector):
+    keywords = [{"word": word, "importance_score": 1.0} for word in words]
+    return worker._save(job_id, diary_id, keywords, embedding.encode_vector(vector))
+
+
+def sweep(backend: ScoringBackend):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return asyncio.run(run_sweep(LocalMatchRepository(), backend, executor=executor))
+
+
+@pytest.mark.skipif(not embedding.is_available(), reason="numpy is required")
+def test_vectors_written_by_nlp_jobs_reach_the_embedding_sweep():
+    worker = NLPJobWorker()
+    db = SessionLocal()
+    try:
+        (a, job_a), (b, job_b), (c, job_c) = (add_diary(db) for _ in range(3))
+    finally:
+        db.close()
+
+    # キーワードは共通しないが、a と b の文書ベクトルはほぼ同じ向き
+    save_analysis(worker, job_a, a, ["海"], [1.0, 0.0, 0.1])
+    save_analysis(worker, job_b, b, ["山"], [1.0, 0.0, 0.12])
+    save_analysis(worker, job_c, c, ["空"], [0.0, 1.0, 0.0])
+
+    result = sweep(ScoringBackend.EMBEDDING)
+
+    assert [sorted(room) for room in result["matched_groups"]] == [sorted([a, b])]
+    db = SessionLocal()
+    try:
+        assert {d.id: d.matched for d in db.query(Diary)} == {a: True, b: True, c: False}
+        assert db.query(ChatRoom).count() == 1
+    finally:
+        db.close()
+
+    # マッチ済みの日記は次の実行の候補にならない
+    assert sweep(ScoringBackend.EMBEDDING)["matched_groups"] == []
+
+
+def test_keyword_sweep_compares_the_packed_keyword_ids():
+    worker = NLPJobWorker()
+    db = SessionLocal()
+    try:
+        (a, job_a), (b, job_b) = (add_diary(db) for _ in range(2))
+    finally:
+        db.close()
+
+    save_analysis(worker, job_a, a, ["海", "散歩", "夕日"], [1.0])
+    save_analysis(worker, job_b, b, ["海", "散歩", "夕日"], [1.0])
+
+    # 一括マッチングも逐次マッチャーと同じ語彙IDの集合で比較する
+    keywords = asyncio.run(LocalMatchRepository().load_keywords([a, b]))
+    assert keywords[a] == keywords[b] == set(vocabulary.intern(["海", "散歩", "夕日"]).values())
+
+    result = sweep(ScoringBackend.PYTHON)
+    assert [sorted(room) for room in result["matched_groups"]] == [sorted([a, b])]
+
+    db = SessionLocal()
+    try:
+        room = db.query(ChatRoom).one()
+        assert sorted(room.empathy_words) == sorted(["海", "散歩", "夕日"])
+    finally:
+        db.close()
+
+
+def test_incremental_matcher_rebuilds_its_pool_and_claims_diaries():
+    worker = NLPJobWorker()
+    db = SessionLocal()
+    try:
+        (a, job_a), (b, job_b), (c, job_c) = (add_diary(db) for _ in range(3))
+    finally:
+        db.close()
+
+    # マッチャーの起動前に解析された日記（再起動や別プロセスで処理された日記）
+    save_analysis(worker, job_a, a, ["海", "夏"], [1.0, 0.0])
+    save_analysis(worker, job_b, b, ["海", "夏"], [1.0, 0.0])
+    save_analysis(worker, job_c, c, ["雪"], [0.0, 1.0])
+    # 感情タグのない日記は同じキーワードでもプールに入れない
+    db = SessionLocal()
+    try:
+        (d, job_d), (e, job_e) = (add_diary(db, emotion=None) for _ in range(2))
+    finally:
+        db.close()
+    save_analysis(worker, job_d, d, ["霧"], [0.0, 1.0])
+    save_analysis(worker, job_e, e, ["霧"], [0.0, 1.0])
+
+    notified = []
+
+    async def on_room_created(room):
+        notified.append(sorted(room.participants))
+
+    async def run():
+        matcher = IncrementalMatcher()
+        await matcher.start(create_room_for_diaries, load_unmatched_diaries, on_room_created)
+        await matcher._queue.join()
+        await matcher.stop()
+        return matcher
+
+    matcher = asyncio.run(run())
+
+    assert notified == [sorted([a, b])]
+    assert [e.diary_id for pool in matcher.pools.values() for e in pool.entries.values()] == [c]
+    db = SessionLocal()
+    try:
+        assert {diary.id: diary.matched for diary in db.query(Diary)} == {a: True, b: True, c: False, d: False, e: False}
+        assert db.query(ChatRoom).count() == 1
+    finally:
+        db.close()
+
+    # 一括マッチングなどで既にマッチした日記はルームに入れない
+    with pytest.raises(DiariesAlreadyMatched) as raised:
+        create_room_for_diaries([a, c], [])
+    assert raised.value.diary_ids == {a}
+    db = SessionLocal()
+    try:
+        assert db.get(Diary, c).matched is False
+        assert db.query(ChatRoom).count() == 1
+    finally:
+        db.close()
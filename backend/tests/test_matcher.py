@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+from app.services import jaccard_sparse
+from app.services.matcher import GroupingMode, ScoringBackend, jaccard, plan_rooms
+
+BACKENDS = [ScoringBackend.PYTHON]
+if jaccard_sparse.is_available():
+    BACKENDS.append(ScoringBackend.SPARSE)
+
+
+def random_group(rng: random.Random, size: int, vocabulary: int = 8):
+    """共通語が多く、同じ類似度の辺が多数できる小さな語彙の日記グループ"""
+    group = [{"id": f"diary-{i:03d}"} for i in range(size)]
+    keywords = {d["id"]: set(rng.sample(range(vocabulary), rng.randint(1, 4))) for d in group}
+    return group, keywords
+
+
+def room_ids(rooms):
+    return [[diary["id"] for diary in room] for room in rooms]
+
+
+def brute_force_anchor(group, keywords, threshold=0.7, max_size=5):
+    """全ペアを比べる参照実装: 入力順に未割り当ての日記を起点とし、後ろの日記を先着順に加える"""
+    taken, rooms = set(), []
+    for i, anchor in enumerate(group):
+        if anchor["id"] in taken:
+            continue
+        members = [anchor]
+        for other in group[i + 1:]:
+            if len(members) >= max_size:
+                break
+            if other["id"] not in taken and jaccard(keywords[anchor["id"]], keywords[other["id"]]) >= threshold:
+                members.append(other)
+        if len(members) >= 2:
+            taken.update(diary["id"] for diary in members)
+            rooms.append(members)
+    return rooms
+
+
+def brute_force_graph(group, keywords, threshold=0.7, max_size=5):
+    """全ペアの辺を (類似度の降順, 日記IDの組) で並べ、大きさの上限内でまとまりを結合する参照実装"""
+    edges = []
+    for i, a in enumerate(group):
+        for b in group[i + 1:]:
+            similarity = jaccard(keywords[a["id"]], keywords[b["id"]])
+            if similarity >= threshold:
+                edges.append((-similarity, min(a["id"], b["id"]), max(a["id"], b["id"])))
+
+    components = {diary["id"]: {diary["id"]} for diary in group}
+    for _, a, b in sorted(edges):
+        if components[a] is not components[b] and len(components[a]) + len(components[b]) <= max_size:
+            merged = components[a] | components[b]
+            for diary_id in merged:
+                components[diary_id] = merged
+
+    rooms = {frozenset(members) for members in components.values() if len(members) >= 2}
+    return sorted(sorted(room) for room in rooms)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_anchor_rooms_match_the_brute_force_reference(backend):
+    rng = random.Random(1)
+    for _ in range(200):
+        group, keywords = random_group(rng, rng.randint(2, 60))
+        rooms, _ = plan_rooms(group, keywords, backend=backend)
+        assert room_ids(rooms) == room_ids(brute_force_anchor(group, keywords))
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_graph_rooms_match_the_brute_force_reference(backend):
+    rng = random.Random(5)
+    for _ in range(100):
+        group, keywords = random_group(rng, rng.randint(2, 60))
+        rooms, _ = plan_rooms(group, keywords, max_size=3, backend=backend, mode=GroupingMode.GRAPH)
+        assert room_ids(rooms) == brute_force_graph(group, keywords, max_size=3)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_graph_rooms_do_not_depend_on_input_order(backend):
+    rng = random.Random(9)
+    for _ in range(50):
+        group, keywords = random_group(rng, rng.randint(2, 40))
+        expected, _ = plan_rooms(group, keywords, backend=backend, mode=GroupingMode.GRAPH)
+
+        for _ in range(5):
+            shuffled = group[:]
+            rng.shuffle(shuffled)
+            rooms, _ = plan_rooms(shuffled, keywords, backend=backend, mode=GroupingMode.GRAPH)
+            assert room_ids(rooms) == room_ids(expected)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_graph_rooms_respect_size_and_are_disjoint(backend):
+    rng = random.Random(3)
+    group, keywords = random_group(rng, 200)
+    rooms, _ = plan_rooms(group, keywords, max_size=4, backend=backend, mode=GroupingMode.GRAPH)
+
+    assert rooms
+    ids = [diary_id for room in room_ids(rooms) for diary_id in room]
+    assert len(ids) == len(set(ids))
+    assert all(2 <= len(room) <= 4 for room in rooms)
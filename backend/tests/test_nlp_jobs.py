@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+import asyncio
+
+import pytest
+
+from app.db.models import Diary, NLPJob
+from app.db.session import SessionLocal
+from app.services import nlp_jobs
+from app.services.nlp_batcher import KeywordBatcher
+from app.services.nlp_jobs import FAILED, PENDING, RUNNING, NLPJobWorker
+
+pytestmark = pytest.mark.usefixtures("db_tables")
+
+
+def add_job(**fields) -> int:
+    db = SessionLocal()
+    try:
+        diary = Diary(content="x", emotion_tag="sad")
+        db.add(diary)
+        db.flush()
+        job = NLPJob(diary_id=diary.id, **fields)
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def job_state(job_id: int):
+    db = SessionLocal()
+    try:
+        job = db.get(NLPJob, job_id)
+        return job.status, job.locked_until
+    finally:
+        db.close()
+
+
+def test_only_jobs_with_an_expired_lease_are_requeued():
+    now = datetime.utcnow()
+    worker = NLPJobWorker(lease=60, max_attempts=3)
+    # 他のプロセスが処理中（期限内）のジョブ
+    live = add_job(status=RUNNING, attempts=1, locked_until=now + timedelta(seconds=30))
+    # 処理中のプロセスが落ちたジョブ
+    expired = add_job(status=RUNNING, attempts=1, locked_until=now - timedelta(seconds=1))
+    exhausted = add_job(status=RUNNING, attempts=3, locked_until=now - timedelta(seconds=1))
+    # 期限を導入する前に取り出されたジョブは updated_at で判断する
+    legacy = add_job(status=RUNNING, attempts=1, updated_at=now - timedelta(seconds=120))
+
+    assert worker._requeue_expired() == (2, 1)
+    assert job_state(live)[0] == RUNNING
+    assert job_state(expired) == (PENDING, None)
+    assert job_state(legacy) == (PENDING, None)
+    assert job_state(exhausted)[0] == FAILED
+
+
+def test_claimed_jobs_hold_a_lease_until_they_finish():
+    worker = NLPJobWorker(lease=60)
+    job_id = add_job()
+
+    (claimed_id, diary_id, attempt), = worker._claim(10)
+    status, locked_until = job_state(job_id)
+    assert (claimed_id, attempt, status) == (job_id, 1, RUNNING)
+    assert locked_until > datetime.utcnow() + timedelta(seconds=50)
+    assert worker._requeue_expired() == (0, 0)
+
+    worker._extend_leases([job_id])
+    assert job_state(job_id)[1] >= locked_until
+
+    worker._reschedule(job_id, give_up=False, delay=0, error="boom")
+    assert job_state(job_id) == (PENDING, None)
+
+
+def test_analysis_errors_reach_the_retry_path(monkeypatch):
+    async def fail(text):
+        raise RuntimeError("analysis failed")
+
+    worker = NLPJobWorker(lease=60, backoff=10)
+    job_id = add_job()
+    (_, diary_id, attempt), = worker._claim(1)
+    monkeypatch.setattr(worker, "_load_content", lambda diary_id: "text")
+    monkeypatch.setattr(nlp_jobs.keyword_batcher, "analyze", fail)
+
+    asyncio.run(worker._process(job_id, diary_id, attempt))
+
+    db = SessionLocal()
+    try:
+        job = db.get(NLPJob, job_id)
+        assert (job.status, job.last_error, worker.retried) == (PENDING, "analysis failed", 1)
+        assert job.next_run_at > datetime.utcnow() + timedelta(seconds=5)
+    finally:
+        db.close()
+
+
+def test_batcher_returns_each_failure_to_its_own_caller():
+    async def process_batch(texts):
+        return [ValueError(text) if text == "bad" else ([{"word": text}], None) for text in texts]
+
+    async def run():
+        batcher = KeywordBatcher(process_batch, max_size=2, max_wait_ms=1000)
+        return await asyncio.gather(batcher.analyze("good"), batcher.analyze("bad"), return_exceptions=True)
+
+    good, bad = asyncio.run(run())
+    assert good == ([{"word": "good"}], None)
+    assert isinstance(bad, ValueError)
+
+
+def test_retries_back_off_exponentially_and_give_up_after_max_attempts():
+    worker = NLPJobWorker(max_attempts=3, backoff=10, backoff_max=25)
+    job_id = add_job(status=RUNNING)
+
+    def next_run_in(attempt: int):
+        asyncio.run(worker._retry(job_id, "diary", attempt, RuntimeError(f"attempt {attempt}")))
+        db = SessionLocal()
+        try:
+            job = db.get(NLPJob, job_id)
+            return job.status, (job.next_run_at - datetime.utcnow()).total_seconds()
+        finally:
+            db.close()
+
+    status, delay = next_run_in(1)
+    assert status == PENDING and 9 < delay <= 10
+    status, delay = next_run_in(2)
+    assert status == PENDING and 19 < delay <= 20
+    # 3回目で上限の試行回数に達する（待ち時間は backoff_max まで）
+    status, delay = next_run_in(3)
+    assert status == FAILED and 24 < delay <= 25
+    assert (worker.retried, worker.failed) == (2, 1)
+
+
+def test_a_job_read_by_two_workers_is_claimed_once():
+    # SQLite には行ロックがないため、2つのプロセスが同じ候補を読んだ状況を再現する
+    now = datetime.utcnow()
+    locked_until = now + timedelta(seconds=60)
+    first, second = NLPJobWorker(lease=60), NLPJobWorker(lease=60)
+    job_id = add_job()
+
+    db = SessionLocal()
+    try:
+        assert first._try_claim(db, job_id, 0, locked_until, now)
+        db.commit()
+        assert not second._try_claim(db, job_id, 0, locked_until, now)
+        db.commit()
+    finally:
+        db.close()
+
+    assert job_state(job_id) == (RUNNING, locked_until)
+    assert second._claim(10) == []
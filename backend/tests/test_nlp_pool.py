@@ -0,0 +1,37 @@
+import asyncio
+
+from app.services.nlp_pool import TextSlots
+
+
+def test_batches_hold_one_slot_per_text():
+    async def run():
+        slots = TextSlots(4)
+        order = []
+        release = asyncio.Event()
+
+        async def batch(name: str, texts: int):
+            async with slots.hold(texts):
+                order.append((name, slots.in_use))
+                await release.wait()
+
+        first = asyncio.create_task(batch("a", 3))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(batch("b", 2))  # 残り1枠では足りない
+        await asyncio.sleep(0)
+        assert order == [("a", 3)]
+
+        release.set()
+        await asyncio.gather(first, second)
+        assert order == [("a", 3), ("b", 2)]
+        assert slots.in_use == 0
+
+    asyncio.run(run())
+
+
+def test_batches_larger_than_the_limit_run_alone():
+    async def run():
+        slots = TextSlots(4)
+        async with slots.hold(10):
+            assert slots.in_use == 4
+
+    asyncio.run(run())
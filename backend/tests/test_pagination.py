@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.security import get_encryption_service
+from app.db import crud
+from app.db.models import Diary
+from app.db.pagination import InvalidCursor
+from app.db.session import SessionLocal
+
+pytestmark = pytest.mark.usefixtures("db_tables")
+
+NOW = datetime.utcnow()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def add_diaries(db, rows):
+    """(ID, 投稿時刻, 感情タグ) の日記を保存"""
+    encrypted = get_encryption_service().encrypt_text("本文")
+    for diary_id, created_at, emotion in rows:
+        db.add(Diary(
+            id=diary_id,
+            content=encrypted,
+            emotion_tag=emotion,
+            created_at=created_at,
+            expires_at=NOW + timedelta(hours=24),
+        ))
+    db.commit()
+
+
+def read_all_pages(db, limit, emotion_tag=None):
+    ids, cursor = [], None
+    while True:
+        diaries, cursor = crud.get_diary_page(db, limit, cursor, emotion_tag)
+        ids.extend(diary.id for diary in diaries)
+        # 復号した本文がセッションに書き戻されないよう、ページごとに捨てる
+        db.expunge_all()
+        if cursor is None:
+            return ids
+
+
+def test_pages_cover_every_diary_once_when_created_at_ties(db):
+    # 5件が同じ投稿時刻を持ち、ページの境目が同時刻の日記の途中に来る
+    tied = NOW - timedelta(minutes=5)
+    rows = [(f"d{i}", tied, "sad") for i in range(5)]
+    rows += [("e0", NOW - timedelta(minutes=1), "happy"), ("e1", NOW - timedelta(minutes=9), "sad")]
+    add_diaries(db, rows)
+
+    expected = ["e0", "d4", "d3", "d2", "d1", "d0", "e1"]
+    for limit in (1, 2, 3, 7, 10):
+        assert read_all_pages(db, limit) == expected
+    assert read_all_pages(db, 2, emotion_tag="sad") == [i for i in expected if i != "e0"]
+
+
+def test_expired_diaries_are_not_listed(db):
+    add_diaries(db, [("live", NOW - timedelta(minutes=1), None)])
+    db.add(Diary(id="old", content="x", created_at=NOW - timedelta(hours=30), expires_at=NOW - timedelta(hours=6)))
+    db.commit()
+
+    diaries, cursor = crud.get_diary_page(db, 10)
+    assert ([d.id for d in diaries], cursor) == (["live"], None)
+
+
+def test_malformed_cursors_are_rejected(db):
+    with pytest.raises(InvalidCursor):
+        crud.get_diary_page(db, 10, "not-a-cursor")